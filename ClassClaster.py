@@ -1,9 +1,12 @@
+import colorsys
 import pygame as py
-from enum import Enum
-from collections import deque
-from random import randint, random
+import numpy as np
+import simulation
+from simulation import Position, LiveState, SpeedState, State, Rules, EventType, rand_event
 from interface_utils import color
 
+# Rendering and sound adapters on top of the pure simulation
+
 EMPTY_BASE_COLOR = color("577590")
 EMPTY_BORDER_COLOR = color("6687A3")
 
@@ -16,413 +19,242 @@ TAIL_COLOR_1 = color("F9C74F")
 HEAD_COLOR_2 = color("8BB964")
 TAIL_COLOR_2 = color("C0D8AB")
 
-py.mixer.init()
-bite_sound = py.mixer.Sound("apple-bite.wav")
-bite_sound.set_volume(0.3)
-
-
-class Position:
-    def __init__(self, x=0, y=0):
-        self.x = x
-        self.y = y
-
-    def __add__(self, other):
-        if isinstance(other, Position):
-            return Position(self.x + other.x, self.y + other.y)
-        return NotImplemented
-
-    def __iadd__(self, other):
-        if isinstance(other, Position):
-            self.x += other.x
-            self.y += other.y
-            return self
-        return NotImplemented
-
-    def __sub__(self, other):
-        if isinstance(other, Position):
-            return Position(self.x - other.x, self.y - other.y)
-        return NotImplemented
-
-    def __isub__(self, other):
-        if isinstance(other, Position):
-            self.x -= other.x
-            self.y -= other.y
-            return self
-        return NotImplemented
-
-    def __mul__(self, value):
-        if isinstance(value, int):
-            return Position(self.x * value, self.y * value)
-        return NotImplemented
-
-    def __imul__(self, value):
-        if isinstance(value, int):
-            self.x *= value
-            self.y *= value
-            return self
-        return NotImplemented
-
-    def __rmul__(self, value):
-        return self.__mul__(value)
-
-    def __neg__(self):
-        return Position(-self.x, -self.y)
-
-    def __eq__(self, other):
-        if isinstance(other, Position):
-            return self.x == other.x and self.y == other.y
-        return NotImplemented
-
-    def __ne__(self, other):
-        return not self.__eq__(other)
-
-    def __repr__(self):
-        return "(" + str(self.x) + ", " + str(self.y) + ")"
-
-    def copy(self):
-        return Position(self.x, self.y)
-
-
-# values normally represent game cycles (FPS of the game)
-class LiveState(Enum):
-    ONE_TIME = 0
-    REVIVABLE = 300
-
-
-class SpeedState(Enum):
-    NORMAL = 30
-    ACCELERATION = 10
-
-
-class State(Enum):
-    EMPTY = 0
-    SNACK = 1
-    APPLE = 3
-    TAIL = 10
-    HEAD_LEFT = Position(-1, 0)
-    HEAD_UP = Position(0, -1)
-    HEAD_RIGHT = Position(1, 0)
-    HEAD_DOWN = Position(0, 1)
+# snakes after the first two get hues spread by the golden ratio, so neighbours in the list differ a lot
+GOLDEN_RATIO = 0.618033988749895
+
+
+# head and tail color of the snake with the given name
+def snake_colors(name: int) -> tuple[tuple[int, ...], tuple[int, ...]]:
+    if name == 0:
+        return HEAD_COLOR_1, TAIL_COLOR_1
+    if name == 1:
+        return HEAD_COLOR_2, TAIL_COLOR_2
+    hue = (name * GOLDEN_RATIO) % 1
+    head = colorsys.hsv_to_rgb(hue, 0.75, 0.95)
+    tail = colorsys.hsv_to_rgb(hue, 0.3, 0.9)
+    return tuple(int(c * 255) for c in head), tuple(int(c * 255) for c in tail)
+
+
+BITE_SOUND_FILE = "apple-bite.wav"
+BITE_SOUND_VOLUME = 0.3
+
+# mixer is started on the first bite, so importing this module costs nothing
+_bite_sound = None
+_sound_disabled = False
+
+
+def play_bite_sound() -> None:
+    global _bite_sound, _sound_disabled
+    if _sound_disabled:
+        return
+    if _bite_sound is None:
+        try:
+            if not py.mixer.get_init():
+                py.mixer.init()
+            _bite_sound = py.mixer.Sound(BITE_SOUND_FILE)
+            _bite_sound.set_volume(BITE_SOUND_VOLUME)
+        except (py.error, FileNotFoundError):
+            # no audio device - keep playing silently
+            _sound_disabled = True
+            return
+    _bite_sound.play()
 
 
-def rand_event(odd: float) -> bool:
-    return random() <= odd
+# audio subscriber of a field: any number of bites in one tick make a single sound
+def play_bite_sounds(events: list) -> None:
+    for event in events:
+        if event.type == EventType.FOOD_EATEN:
+            play_bite_sound()
+            return
 
 
-class Field:
-    class Square:
-        def __init__(self, x: int, y: int, size: float):
-            self.state = State.EMPTY
-            self.snake = None
-            self.size = int(size)
-            self.rect = (x, y, self.size, self.size)
-            self.eye_size = int(self.size // 25) + 1
-
-        def draw(self, window: py.Surface, snake_color=None) -> None:
-            if snake_color is not None:
-                base_color = snake_color
-            else:
-                if self.state == State.APPLE:
-                    base_color = APPLE_BASE_COLOR
-                elif self.state == State.SNACK:
-                    base_color = SNACK_BASE_COLOR
-                else:
-                    base_color = EMPTY_BASE_COLOR
-
-            py.draw.rect(window, base_color, self.rect, 0)
-
-            if self.state == State.HEAD_UP:
-                x = self.rect[0]
-                y = self.rect[1]
-                py.draw.circle(window, (0, 0, 0), (x + self.size // 3, y + self.size // 3), self.eye_size)
-                py.draw.circle(window, (0, 0, 0), (x + self.size // 3 * 2, y + self.size // 3), self.eye_size)
-            elif self.state == State.HEAD_RIGHT:
-                x = self.rect[0]
-                y = self.rect[1]
-                py.draw.circle(window, (0, 0, 0), (x + self.size // 3 * 2, y + self.size // 3), self.eye_size)
-                py.draw.circle(window, (0, 0, 0), (x + self.size // 3 * 2, y + self.size // 3 * 2), self.eye_size)
-            elif self.state == State.HEAD_DOWN:
-                x = self.rect[0]
-                y = self.rect[1]
-                py.draw.circle(window, (0, 0, 0), (x + self.size // 3, y + self.size // 3 * 2), self.eye_size)
-                py.draw.circle(window, (0, 0, 0), (x + self.size // 3 * 2, y + self.size // 3 * 2), self.eye_size)
-            elif self.state == State.HEAD_LEFT:
-                x = self.rect[0]
-                y = self.rect[1]
-                py.draw.circle(window, (0, 0, 0), (x + self.size // 3, y + self.size // 3), self.eye_size)
-                py.draw.circle(window, (0, 0, 0), (x + self.size // 3, y + self.size // 3 * 2), self.eye_size)
-
-    def __init__(self, x: float, y: float, field_size: float, size: float) -> None:
-        self.field = []
-        self.snakes = []
-        self.food = []
-        self.to_remove_snakes = []
-        self.field_size = int(field_size)
-        self.square_size = int(size // field_size)
-        self.size = self.field_size * self.square_size
+# eyes of a head, as fractions (in thirds) of the square
+HEAD_EYES = {
+    State.HEAD_UP: ((1, 1), (2, 1)),
+    State.HEAD_RIGHT: ((2, 1), (2, 2)),
+    State.HEAD_DOWN: ((1, 2), (2, 2)),
+    State.HEAD_LEFT: ((1, 1), (1, 2)),
+}
+
+
+# body colors of a snake of the given length
+def gradient_colors(start_color: tuple[int, ...], end_color: tuple[int, ...], length: int) -> list[tuple[int, ...]]:
+    # same float steps as adding color_step segment by segment, truncated to ints
+    steps = np.empty((length, 3))
+    steps[0] = start_color
+    steps[1:] = [(end_color[i] - start_color[i]) / length for i in range(3)]
+    colors = [tuple(color) for color in np.cumsum(steps, axis=0).astype(int).tolist()]
+    colors[0] = start_color
+    return colors
+
+
+# pre-rendered squares (food, heads with eyes) of one square size, keyed by state and color
+class SpriteAtlas:
+    def __init__(self, square_size: int) -> None:
+        self.square_size = square_size
+        self.eye_size = int(square_size // 25) + 1
+        self.sprites = {}
+
+    def get(self, state: State, base_color: tuple[int, ...]) -> py.Surface:
+        sprite = self.sprites.get((state, base_color))
+        if sprite is None:
+            sprite = self.render(state, base_color)
+            self.sprites[(state, base_color)] = sprite
+        return sprite
+
+    def render(self, state: State, base_color: tuple[int, ...]) -> py.Surface:
+        size = self.square_size
+        sprite = py.Surface((size, size))
+        if py.display.get_surface() is not None:
+            sprite = sprite.convert()
+        sprite.fill(base_color)
+        for eye_x, eye_y in HEAD_EYES.get(state, ()):
+            py.draw.circle(sprite, (0, 0, 0), (size // 3 * eye_x, size // 3 * eye_y), self.eye_size)
+        return sprite
+
+
+class Field(simulation.Field):
+    # size is the longer side of the field in pixels, squares are at least one pixel
+    def __init__(self, x: float, y: float, rules: Rules, size: float) -> None:
+        super().__init__(rules)
+        self.square_size = max(int(size // max(self.width, self.height)), 1)
+        self.pixel_width = self.width * self.square_size
+        self.pixel_height = self.height * self.square_size
         self.x = int(x)
         self.y = int(y)
-        for i in range(self.field_size):
-            self.field.append([])  # Створює рядки поля
-            for j in range(self.field_size):
-                self.field[-1].append(
-                    Field.Square(j * self.square_size + self.x, i * self.square_size + self.y, self.square_size))
-
-    # returns spawned snake
-    def spawn_snake(self, head_position: Position, facing: State, length: int, live: LiveState, coyote_death_time: int,
-                    drop_start_sprint: bool, sprint_lose_weight: int, odd_when_dying: float):
-        self.snakes.append(Snake(head_position, facing, length, live, coyote_death_time,
-                                        drop_start_sprint, sprint_lose_weight, odd_when_dying, self))
-        return self.snakes[-1]
-
-    def spawn_snack(self, position: Position) -> bool:
-        square = self.get_square(position)
-        if square.state == State.EMPTY:
-            self.food.append(square)
-            square.state = State.SNACK
-            return True
-        return False
-
-    def spawn_apple(self, position: Position) -> bool:
-        square = self.get_square(position)
-        if square.state == State.EMPTY:
-            self.food.append(square)
-            square.state = State.APPLE
-            return True
-        return False
-
-    def rand_position(self) -> Position:
-        return Position(randint(0, self.field_size - 1), randint(0, self.field_size - 1))  # FIELD_SIZE - 1 inclusive
-
-    def rand_free_position(self) -> Position or None:
-        free_positions = [(row, col) for row in range(self.field_size) for col in range(self.field_size) if
-                          self.field[row][col].state == State.EMPTY]
-
-        if len(free_positions) == 0:
-            return None
-
-        rand_index = randint(0, len(free_positions) - 1)
-        return Position(free_positions[rand_index][0], free_positions[rand_index][1])
-
-    def random_spawn_snack(self) -> None:
-        self.spawn_snack(self.rand_free_position())
-
-    def random_spawn_apple(self) -> None:
-        self.spawn_apple(self.rand_free_position())
+        # retained mode: what changed since the last draw_dirty
+        self.dirty_cells = set()  # flat indices y * width + x
+        self.dirty_snakes = set()  # snakes whose gradient has to be repainted
+        self.full_redraw = True
+        # empty board with the grid and square sprites, rebuilt when square_size changes
+        self.background = None
+        self.sprites = None
+        self.subscribe(play_bite_sounds)
 
     def set_square_state(self, position: Position, state: State, snake=None) -> None:
-        self.field[position.y][position.x].state = state
-        self.field[position.y][position.x].snake = snake
+        super().set_square_state(position, state, snake)
+        self.dirty_cells.add(position.y * self.width + position.x)
+        if snake is not None:
+            self.dirty_snakes.add(snake)
 
-    def get_square_state(self, position: Position) -> State:
-        return self.field[position.y][position.x].state
+    # next draw_dirty repaints the whole field
+    def invalidate(self) -> None:
+        self.full_redraw = True
 
-    def set_snakes_speed_state(self, index: int, state: SpeedState) -> None:
-        self.snakes[index].set_speed_state(state)
+    def get_square_rect(self, position: Position) -> tuple[int, int, int, int]:
+        return (position.x * self.square_size + self.x, position.y * self.square_size + self.y,
+                self.square_size, self.square_size)
 
-    def move_snake(self, snake, direction: State) -> None:
-        self.snakes[snake].move(direction)
+    def update_render_cache(self) -> None:
+        if self.sprites is not None and self.sprites.square_size == self.square_size:
+            return
+        self.pixel_width = self.width * self.square_size
+        self.pixel_height = self.height * self.square_size
+        self.sprites = SpriteAtlas(self.square_size)
+
+        self.background = py.Surface((self.pixel_width, self.pixel_height))
+        if py.display.get_surface() is not None:
+            self.background = self.background.convert()
+        self.background.fill(EMPTY_BASE_COLOR)
+        for i in range(1, self.width):
+            pos = self.square_size * i - 1
+            py.draw.line(self.background, EMPTY_BORDER_COLOR, (pos, 0), (pos, self.pixel_height - 1), 2)
+        for i in range(1, self.height):
+            pos = self.square_size * i - 1
+            py.draw.line(self.background, EMPTY_BORDER_COLOR, (0, pos), (self.pixel_width - 1, pos), 2)
+        self.full_redraw = True
+
+    def draw_square(self, window: py.Surface, position: Position, snake_color=None) -> None:
+        state = self.get_square_state(position)
+        if snake_color is not None:
+            base_color = snake_color
+        else:
+            if state == State.APPLE:
+                base_color = APPLE_BASE_COLOR
+            elif state == State.SNACK:
+                base_color = SNACK_BASE_COLOR
+            else:
+                base_color = EMPTY_BASE_COLOR
 
-    def remove_snakes(self) -> None:
-        while len(self.to_remove_snakes) > 0:
-            remove_func = self.to_remove_snakes.pop(0)
-            remove_func()
+        rect = self.get_square_rect(position)
+        if state in HEAD_EYES or state == State.APPLE or state == State.SNACK:
+            window.blit(self.sprites.get(state, base_color), rect)
+        else:
+            window.fill(base_color, rect)
 
-    def get_square(self, position: Position) -> Square:
-        return self.field[position.y][position.x]
+    # repaints a square without a snake, empty squares are copied from the background
+    def restore_square(self, window: py.Surface, position: Position) -> None:
+        if self.get_square_state(position) != State.EMPTY:
+            self.draw_square(window, position)
+            return
+        rect = self.get_square_rect(position)
+        window.blit(self.background, rect, (rect[0] - self.x, rect[1] - self.y, rect[2], rect[3]))
 
     def draw(self, screen: py.Surface) -> None:
-        py.draw.rect(screen, EMPTY_BASE_COLOR, (self.x, self.y, self.size, self.size))
-        for i in range(1, self.field_size):
-            x_pos = self.x + self.square_size * i - 1
-            py.draw.line(screen, EMPTY_BORDER_COLOR, (x_pos, self.y), (x_pos, self.y + self.size - 1), 2)
-        for i in range(1, self.field_size):
-            y_pos = self.y + self.square_size * i - 1
-            py.draw.line(screen, EMPTY_BORDER_COLOR, (self.x, y_pos), (self.x + self.size - 1, y_pos), 2)
+        self.update_render_cache()
+        screen.blit(self.background, (self.x, self.y))
         for snake in self.snakes:
             snake.draw(screen)
         for food in self.food:
-            food.draw(screen)
-
-
-class Snake:
+            self.draw_square(screen, food)
+
+        self.dirty_cells.clear()
+        self.dirty_snakes.clear()
+        self.full_redraw = False
+
+    # repaints only what changed since the last call, returns rects for py.display.update
+    def draw_dirty(self, screen: py.Surface) -> list[py.Rect]:
+        self.update_render_cache()
+        if self.full_redraw:
+            self.draw(screen)
+            return [py.Rect(self.x, self.y, self.pixel_width, self.pixel_height)]
+
+        rects = []
+        for snake in self.dirty_snakes:
+            if not self.has_snake(snake):
+                continue  # removed for good, its squares are dirty cells
+            rects.extend(snake.draw(screen))
+            for position in snake.snake:
+                self.dirty_cells.discard(position.y * self.width + position.x)
+
+        for index in self.dirty_cells:
+            position = self.cell_positions[index]
+            if self.get_square_snake(position) is None:
+                self.restore_square(screen, position)
+                rects.append(py.Rect(self.get_square_rect(position)))
+
+        self.dirty_cells.clear()
+        self.dirty_snakes.clear()
+        return rects
+
+
+class Snake(simulation.Snake):
     def __init__(self, head_position: Position, facing: State, length: int, live: LiveState,
                  coyote_death_time: int, drop_start_sprint: bool, sprint_lose_weight: int, odd_when_dying: float,
                  field: Field):
-        self.snake = deque()
-        self.field = field
-        self.direction = facing
-        self.name = len(self.field.snakes)
-        if self.name == 0:
-            self.start_color = HEAD_COLOR_1
-            self.end_color = TAIL_COLOR_1
-        else:
-            self.start_color = HEAD_COLOR_2
-            self.end_color = TAIL_COLOR_2
-
-        self.food = 0
-
-        self.move_timer = 0
-        self.speed_state = SpeedState.NORMAL
-
-        self.DROP_START_SPRINT = drop_start_sprint
-        self.sprint_lose_weight_timer = 0
-        self.SPRINT_LOSE_WEIGHT = sprint_lose_weight
-        self.ODD_WHEN_DYING = odd_when_dying
-
-        self.START_TAIL_LENGTH = length - 1
-        self.near_death_counter = 0  # represents if sneak had died previous move
-        self.COYOTE_DEATH_TIME = coyote_death_time
-        self.revive_timer = 0
-        self.LIVE_STATE = live
-
-        self.snake.append(head_position.copy())
-        self.field.set_square_state(head_position, facing, self)
-
-        for i in range(self.START_TAIL_LENGTH):
-            head_position -= facing.value
-            self.snake.append(head_position.copy())
-            self.field.set_square_state(head_position, State.TAIL, self)
-
-    def set_speed_state(self, state: SpeedState) -> None:
-        self.speed_state = state
-        self.move_timer = 0
-        if state == SpeedState.ACCELERATION:
-            self.sprint_lose_weight_timer = 0
-            if self.DROP_START_SPRINT:
-                self.lose_weight()
+        super().__init__(head_position, facing, length, live, coyote_death_time,
+                         drop_start_sprint, sprint_lose_weight, odd_when_dying, field)
+        self.start_color, self.end_color = snake_colors(self.name)
+        # colors of the current length only, replaced when the length changes
+        self.gradient = []
 
     def lose_weight(self) -> None:
-        if len(self.snake) > 1:
-            poop_pos = self.snake.pop()
-            self.field.set_square_state(poop_pos, State.SNACK)
-            self.field.food.append(self.field.get_square(poop_pos))
-
-    def revive(self) -> None:
-        # direction is same as before death
-        self.food = self.START_TAIL_LENGTH
-
-        self.move_timer = 0
-        self.sprint_lose_weight_timer = 0
-
-        random_pos = self.field.rand_free_position()
-        if random_pos is None:
-            return
-
-        self.revive_timer = 0
-        self.snake.append(random_pos.copy())
-        self.field.set_square_state(random_pos, self.direction, self)
-
-    def remove(self) -> None:
-        while not len(self.snake) == 0:
-            square = self.field.get_square(self.snake.popleft())
-            if rand_event(self.ODD_WHEN_DYING):
-                square.state = State.EMPTY
-            else:
-                square.state = State.SNACK  # leave some mats
-                self.field.food.append(square)
-
-    def complete_remove(self) -> None:
-        self.remove()
-        self.field.snakes.remove(self)
-
-    def dying_check(self, new_direction: State) -> None:
-        if self.near_death_counter != self.COYOTE_DEATH_TIME:
-            self.near_death_counter += 1
-            self.field.set_square_state(self.snake[0], new_direction, self)
-        else:
-            if self.LIVE_STATE == LiveState.ONE_TIME:
-                self.field.to_remove_snakes.append(self.complete_remove)
-            else:
-                self.field.to_remove_snakes.append(self.remove)
-                self.revive_timer = self.LIVE_STATE.value
-                self.near_death_counter = 0
-
-    def move(self, direction: State) -> None:
-        # if needs to be revived
-        if self.revive_timer == 1:
-            self.revive()
-            return
-        # check if need to wait to revive
-        elif self.revive_timer != 0:
-            self.revive_timer -= 1
-            return
-        # else - alive
-
-        # check if need to wait for a move
-        if self.move_timer != 0:
-            self.move_timer -= 1
-            return
-        # else - turn to move
+        super().lose_weight()
+        self.field.dirty_snakes.add(self)  # gradient is spread over a new length
 
-        # restarting timer for movement
-        self.move_timer = self.speed_state.value
-
-        # check if moving outside of tail
-        if len(self.snake) > 1:
-            if self.snake[0] + direction.value != self.snake[1]:
-                self.direction = direction
-        else:
-            self.direction = direction
-        # else don't change
-
-        new_head_position = self.snake[0] + self.direction.value
-
-        # check if going out of field
-        if new_head_position.x < 0 or new_head_position.x >= 25:
-            self.dying_check(self.direction)
-            return
-        if new_head_position.y < 0 or new_head_position.y >= 25:
-            self.dying_check(self.direction)
-            return
-
-        # means if snake crashes into its end-tail, but also it will grow next move
-        if new_head_position == self.snake[-1] and self.food != 0:
-            self.dying_check(self.direction)
-            return
-
-        new_head_square = self.field.get_square(new_head_position)
-        new_head_square_state = new_head_square.state
-
-        if new_head_square_state == State.APPLE or new_head_square_state == State.SNACK:
-            self.field.food.remove(new_head_square)
-            self.food += new_head_square_state.value
-            bite_sound.play()
-        #  elif isinstance(state_of_square.value, Position):  # meaning snake's head
-        # TODO : snakes' heads collision
-        elif new_head_square_state != State.EMPTY:
-            self.dying_check(self.direction)
-            return
-
-        # if all checks done - than we can move our snake
-        self.near_death_counter = 0
-
-        if self.speed_state == SpeedState.ACCELERATION:
-            if self.sprint_lose_weight_timer == self.SPRINT_LOSE_WEIGHT:
-                self.lose_weight()
-                self.sprint_lose_weight_timer = 0
-            else:
-                self.sprint_lose_weight_timer += 1
-
-        self.field.set_square_state(self.snake[0], State.TAIL, self)  # making old head a tail
-        if self.food != 0:
-            self.food -= 1
-        else:
-            self.field.set_square_state(self.snake.pop(), State.EMPTY)  # delete tail
-        self.snake.appendleft(new_head_position)  # adding a new head
-        self.field.set_square_state(self.snake[0], self.direction, self)  # drawing new! head
-
-    def draw(self, screen: py.Surface) -> None:
+    # draws all squares in one blits call, returns their rects
+    def draw(self, screen: py.Surface) -> list[py.Rect]:
         if len(self.snake) == 0:
-            return
-        color_step = ((self.end_color[0] - self.start_color[0]) / len(self.snake),
-                      (self.end_color[1] - self.start_color[1]) / len(self.snake),
-                      (self.end_color[2] - self.start_color[2]) / len(self.snake))
-        real_color = self.start_color
-        current_color = self.start_color
-        for square_pos in self.snake:
-            self.field.get_square(square_pos).draw(screen, real_color)
-            current_color = (current_color[0] + color_step[0],
-                             current_color[1] + color_step[1],
-                             current_color[2] + color_step[2])
-            real_color = (int(current_color[0]), int(current_color[1]), int(current_color[2]))
+            return []
+        if len(self.gradient) != len(self.snake):
+            self.gradient = gradient_colors(self.start_color, self.end_color, len(self.snake))
+        colors = self.gradient
+        sprites = self.field.sprites
+        blits = [(sprites.get(State.TAIL, color), self.field.get_square_rect(position))
+                 for position, color in zip(self.snake, colors)]
+        head_state = self.field.get_square_state(self.snake[0])
+        blits[0] = (sprites.get(head_state, colors[0]), blits[0][1])
+        return screen.blits(blits)
+
+
+Field.snake_class = Snake
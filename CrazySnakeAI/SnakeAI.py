@@ -1,7 +1,8 @@
 import numpy as np
+import struct
 from math import exp, ceil
 from typing import Union
-from CrazySnakeAI.interface_units import *
+from numpy import ndarray
 from enum import Enum
 
 def node_cost(output_values: np.ndarray, expected_values: np.ndarray) -> np.ndarray:
@@ -36,10 +37,72 @@ def derivative_sigmoid(value: float) -> float:
 def derivative_linear(value: float) -> float:
     return 1
 
+# same functions for whole arrays (or batches of them) at once,
+# results are written to out if it is given - it may be the values array itself
+
+def ReLU_array(values: ndarray, out: ndarray=None) -> ndarray:
+    return np.maximum(values, 0, out=out)
+
+def sigmoid_array(values: ndarray, out: ndarray=None) -> ndarray:
+    # exp of a negative number only, so it never overflows
+    negative = values < 0
+    exp_values = np.exp(-np.abs(values))
+    out = np.divide(1, 1 + exp_values, out=out)
+    out[negative] *= exp_values[negative]
+    return out
+
+def linear_array(values: ndarray, out: ndarray=None) -> ndarray:
+    return np.positive(values, out=out)
+
+def derivative_ReLU_array(values: ndarray, out: ndarray=None) -> ndarray:
+    return np.heaviside(values, 0, out=out)
+
+def derivative_sigmoid_array(values: ndarray, out: ndarray=None) -> ndarray:
+    out = sigmoid_array(values, out)
+    out *= 1 - out
+    return out
+
+def derivative_linear_array(values: ndarray, out: ndarray=None) -> ndarray:
+    if out is None:
+        return np.ones_like(values, dtype=np.result_type(values, np.float32))
+    out.fill(1)
+    return out
+
 class ActivationFunctions(Enum):
-    ReLU = (ReLU, derivative_ReLU)
-    sigmoid = (sigmoid, derivative_sigmoid)
-    linear = (linear, derivative_linear)
+    # (function, derivative, array function, array derivative)
+    ReLU = (ReLU, derivative_ReLU, ReLU_array, derivative_ReLU_array)
+    sigmoid = (sigmoid, derivative_sigmoid, sigmoid_array, derivative_sigmoid_array)
+    linear = (linear, derivative_linear, linear_array, derivative_linear_array)
+
+
+# array versions of an activation (an ActivationFunctions member or any (function, derivative) pair);
+# if there are none, scalar functions are applied element by element
+def array_functions(functions) -> tuple:
+    if isinstance(functions, Enum):
+        functions = functions.value
+    if len(functions) == 4:
+        return functions[2], functions[3]
+    return vectorize_scalar(functions[0]), vectorize_scalar(functions[1])
+
+def vectorize_scalar(function):
+    vectorized = np.vectorize(function, otypes=[float])
+
+    def array_function(values: ndarray, out: ndarray=None) -> ndarray:
+        if out is None:
+            return vectorized(values)
+        out[...] = vectorized(values)
+        return out
+
+    return array_function
+
+
+# binary parameter files: header (magic, version, number of layer sizes, dtype, layer sizes) padded to
+# BINARY_ALIGNMENT bytes, then weights (row by row) and biases of every layer, little-endian.
+# They are memory-mapped instead of parsed, so processes loading the same file share it through the page cache
+BINARY_MAGIC = b'SNAKENN\0'
+BINARY_VERSION = 1
+BINARY_HEADER = '<8sII8s'
+BINARY_ALIGNMENT = 64
 
 
 class Layer:
@@ -49,48 +112,77 @@ class Layer:
         self.num_outputs = outputs
         self.weights = weights
         self.biases = biases
-        self.weighted_sum_values = np.zeros(outputs)
-        self.activation_values = np.zeros(outputs)
-        self.activation_function = np.vectorize(functions.value[0])
-        self.derivative_function = np.vectorize(functions.value[1])
+        # buffers are reused by every calculate, buttons and backpropagation read them
+        self.weighted_sum_values = np.zeros(outputs, dtype=weights.dtype)
+        self.activation_values = np.zeros(outputs, dtype=weights.dtype)
+        self.activation_function, self.derivative_function = array_functions(functions)
+        # (batch, outputs) values of the last calculate_batch, kept apart from the ones buttons show
+        self.batch_weighted_sum_values = None
+        self.batch_activation_values = None
         
     def calculate(self, inputs: np.ndarray) -> np.ndarray:
-        self.weighted_sum_values = np.dot(self.weights, inputs) + self.biases
-        self.activation_values = self.activation_function(self.weighted_sum_values)
+        np.matmul(self.weights, inputs, out=self.weighted_sum_values)
+        self.weighted_sum_values += self.biases
+        self.activation_function(self.weighted_sum_values, out=self.activation_values)
         return self.activation_values
 
+    # inputs are (batch, inputs), the whole batch goes through in one matmul
+    def calculate_batch(self, inputs: np.ndarray) -> np.ndarray:
+        if self.batch_weighted_sum_values is None or len(self.batch_weighted_sum_values) != len(inputs):
+            self.batch_weighted_sum_values = np.empty((len(inputs), self.num_outputs), dtype=self.weights.dtype)
+            self.batch_activation_values = np.empty((len(inputs), self.num_outputs), dtype=self.weights.dtype)
+        np.matmul(inputs, self.weights.T, out=self.batch_weighted_sum_values)
+        self.batch_weighted_sum_values += self.biases
+        self.activation_function(self.batch_weighted_sum_values, out=self.batch_activation_values)
+        return self.batch_activation_values
+
 
 class NeuralNetwork:
 
     class Parameters:
         def __init__(self, layer_sizes: tuple[int, ...]=None, filling: str=None, 
-                     lower_bound: float=None, upper_bound: float=None, file_name: str=None):
+                     lower_bound: float=None, upper_bound: float=None, file_name: str=None, dtype: type=None):
             # layer_sizes[n] - num_outputs
             # layer_sizes[n-1] - num_inputs
+            # dtype - np.float64 or np.float32, all arrays are created (or converted once) with it;
+            # None is np.float64, for binary files the dtype they were saved with
             if isinstance(layer_sizes, tuple):
                 
+                if dtype is None:
+                    dtype = np.float64
+                self.dtype = np.dtype(dtype)
+                
                 if not all(isinstance(el, int) for el in layer_sizes):
                     raise ValueError("Invalid arguments")
                 
                 self.layer_sizes = layer_sizes    
                 if filling == 'zeros':
-                    self.weights = [np.zeros((layer_sizes[n], layer_sizes[n-1])) 
+                    self.weights = [np.zeros((layer_sizes[n], layer_sizes[n-1]), dtype=dtype) 
                                      for n in range(1, len(layer_sizes))]
-                    self.biases = [np.zeros(layer_sizes[n])
+                    self.biases = [np.zeros(layer_sizes[n], dtype=dtype)
                             for n in range(1, len(layer_sizes))]
                 elif filling == 'uniform':
-                    self.weights = [np.random.uniform(lower_bound, upper_bound, size=(layer_sizes[n], layer_sizes[n-1])) 
+                    self.weights = [np.random.uniform(lower_bound, upper_bound, size=(layer_sizes[n], layer_sizes[n-1])).astype(dtype) 
                                      for n in range(1, len(layer_sizes))]
-                    self.biases = [np.random.uniform(lower_bound, upper_bound, size=layer_sizes[n])
+                    self.biases = [np.random.uniform(lower_bound, upper_bound, size=layer_sizes[n]).astype(dtype)
                             for n in range(1, len(layer_sizes))]
                 elif filling == 'randint':
-                    self.weights = [np.random.randint(lower_bound, upper_bound, size=(layer_sizes[n], layer_sizes[n-1])) 
+                    self.weights = [np.random.randint(lower_bound, upper_bound, size=(layer_sizes[n], layer_sizes[n-1])).astype(dtype) 
                                      for n in range(1, len(layer_sizes))]
-                    self.biases = [np.random.randint(lower_bound, upper_bound, size=layer_sizes[n])
+                    self.biases = [np.random.randint(lower_bound, upper_bound, size=layer_sizes[n]).astype(dtype)
                             for n in range(1, len(layer_sizes))]
 
             elif isinstance(file_name, str):
                 
+                with open(file_name, 'rb') as file:
+                    binary = file.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+                if binary:
+                    self.load_binary(file_name, dtype)
+                    return
+                
+                if dtype is None:
+                    dtype = np.float64
+                self.dtype = np.dtype(dtype)
                 with open(file_name, 'rb') as file:
                     
                     self.layer_sizes = tuple([int(num) for num in file.readline().decode('utf-8').split(' ')])
@@ -99,35 +191,41 @@ class NeuralNetwork:
                     
                     for index in range(1, len(self.layer_sizes)):
                         self.weights.append(np.array( [[float(num) for num in file.readline().decode('utf-8').split(' ')] 
-                                                       for n in range(self.layer_sizes[index])] ))
-                        self.biases.append(np.array( [float(num) for num in file.readline().decode('utf-8').split(' ')] ))
+                                                       for n in range(self.layer_sizes[index])], dtype=dtype ))
+                        self.biases.append(np.array( [float(num) for num in file.readline().decode('utf-8').split(' ')], dtype=dtype ))
 
             else:
                 raise ValueError("Invalid arguments")
 
         @classmethod
-        def zeros(cls, layer_sizes: tuple[int, ...]):
-            return cls(layer_sizes=layer_sizes, filling='zeros')
+        def zeros(cls, layer_sizes: tuple[int, ...], dtype: type=np.float64):
+            return cls(layer_sizes=layer_sizes, filling='zeros', dtype=dtype)
 
         @classmethod
-        def uniform(cls, layer_sizes: tuple[int, ...], lower_bound: float, upper_bound: float):
-            return cls(layer_sizes=layer_sizes, filling='uniform', lower_bound=lower_bound, upper_bound=upper_bound)
+        def uniform(cls, layer_sizes: tuple[int, ...], lower_bound: float, upper_bound: float, dtype: type=np.float64):
+            return cls(layer_sizes=layer_sizes, filling='uniform', lower_bound=lower_bound, upper_bound=upper_bound, dtype=dtype)
         
         @classmethod
-        def randint(cls, layer_sizes: tuple[int, ...], lower_bound: float, upper_bound: float):
-            return cls(layer_sizes=layer_sizes, filling='randint', lower_bound=lower_bound, upper_bound=upper_bound)
+        def randint(cls, layer_sizes: tuple[int, ...], lower_bound: float, upper_bound: float, dtype: type=np.float64):
+            return cls(layer_sizes=layer_sizes, filling='randint', lower_bound=lower_bound, upper_bound=upper_bound, dtype=dtype)
 
+        # text or binary file, binary ones are read-only memory maps unless they are converted to another dtype
         @classmethod
-        def file(cls, file_name: str):
-            return cls(file_name=file_name)
+        def file(cls, file_name: str, dtype: type=None):
+            return cls(file_name=file_name, dtype=dtype)
         
+        # dtype=None keeps the dtype of other_parameters
         @classmethod
-        def copy(cls, other_parameters):
-            new = cls.zeros(other_parameters.layer_sizes)
+        def copy(cls, other_parameters, dtype: type=None):
+            new = cls.zeros(other_parameters.layer_sizes, other_parameters.dtype if dtype is None else dtype)
             new.copy_from(other_parameters)
             return new
 
-        def save_parameters(self, file_name: str) -> None:
+        def save_parameters(self, file_name: str, binary: bool=False) -> None:
+            if binary:
+                self.save_binary(file_name)
+                return
+            
             with open(file_name, 'wb') as file:
             
                 line = ' '.join( str(num) for num in self.layer_sizes ) + '\n'
@@ -140,6 +238,48 @@ class NeuralNetwork:
                     line = ' '.join( str(el) for el in bias ) + '\n'
                     file.write(line.encode('utf-8'))
 
+        def save_binary(self, file_name: str) -> None:
+            dtype = self.dtype.newbyteorder('<')
+            header = struct.pack(BINARY_HEADER, BINARY_MAGIC, BINARY_VERSION, len(self.layer_sizes), dtype.str.encode('ascii'))
+            header += struct.pack(f'<{len(self.layer_sizes)}I', *self.layer_sizes)
+            header += bytes(-len(header) % BINARY_ALIGNMENT)
+            
+            with open(file_name, 'wb') as file:
+                file.write(header)
+                for weight, bias in zip(self.weights, self.biases):
+                    file.write(np.ascontiguousarray(weight, dtype=dtype).tobytes())
+                    file.write(np.ascontiguousarray(bias, dtype=dtype).tobytes())
+
+        def load_binary(self, file_name: str, dtype: type=None) -> None:
+            with open(file_name, 'rb') as file:
+                header = file.read(struct.calcsize(BINARY_HEADER))
+                magic, version, num_sizes, stored_dtype = struct.unpack(BINARY_HEADER, header)
+                if version != BINARY_VERSION:
+                    raise ValueError(f"Unsupported parameter file version {version}")
+                self.layer_sizes = struct.unpack(f'<{num_sizes}I', file.read(4 * num_sizes))
+            offset = len(header) + 4 * num_sizes
+            offset += -offset % BINARY_ALIGNMENT
+            
+            stored_dtype = np.dtype(stored_dtype.rstrip(b'\0').decode('ascii'))
+            data = np.memmap(file_name, dtype=stored_dtype, mode='r', offset=offset).view(np.ndarray)
+            if len(data) != sum(self.layer_sizes[n] * (self.layer_sizes[n-1] + 1) for n in range(1, len(self.layer_sizes))):
+                raise ValueError(f"Parameter file {file_name} does not match its layer sizes")
+            
+            self.dtype = np.dtype(stored_dtype.newbyteorder('=') if dtype is None else dtype)
+            self.weights = []
+            self.biases = []
+            start = 0
+            for n in range(1, len(self.layer_sizes)):
+                end = start + self.layer_sizes[n] * self.layer_sizes[n-1]
+                weight = data[start:end].reshape(self.layer_sizes[n], self.layer_sizes[n-1])
+                bias = data[end:end + self.layer_sizes[n]]
+                start = end + self.layer_sizes[n]
+                if stored_dtype != self.dtype:
+                    weight = weight.astype(self.dtype)
+                    bias = bias.astype(self.dtype)
+                self.weights.append(weight)
+                self.biases.append(bias)
+
         def copy_from(self, other_parameters) -> bool:
             if self.layer_sizes != other_parameters.layer_sizes:
                 return False
@@ -150,10 +290,18 @@ class NeuralNetwork:
 
     def __init__(self, parameters: Parameters,
                  node_cost_functions: CostFunctions,
-                 functions: Union[list[ActivationFunctions], ActivationFunctions] ):
-        self.parameters = NeuralNetwork.Parameters.copy(parameters)
+                 functions: Union[list[ActivationFunctions], ActivationFunctions], dtype: type=None,
+                 copy_parameters: bool=True ):
+        # dtype=None keeps the dtype of parameters
+        # without copy_parameters the network works on the given parameters themselves (unless they have to be
+        # converted to dtype), so read-only memory-mapped ones are shared, but such a network can't be trained
+        if copy_parameters or (dtype is not None and np.dtype(dtype) != parameters.dtype):
+            self.parameters = NeuralNetwork.Parameters.copy(parameters, dtype)
+        else:
+            self.parameters = parameters
         self.layer_sizes = self.parameters.layer_sizes
-        self.inputs = np.zeros(self.layer_sizes[0])
+        self.dtype = self.parameters.dtype
+        self.inputs = np.zeros(self.layer_sizes[0], dtype=self.dtype)
 
         if isinstance(functions, list):
             self.layers = [Layer(self.layer_sizes[i], self.layer_sizes[i+1], self.parameters.weights[i], self.parameters.biases[i], functions[i]) 
@@ -176,41 +324,49 @@ class NeuralNetwork:
         for i in range(len(self.inputs)):
             self.inputs[i] = inputs[i]
         #self.inputs = inputs.copy()
+        inputs = self.inputs
         for layer in self.layers:
             inputs = layer.calculate(inputs)
         return inputs.copy()
 
-    def save_parameters(self, file_name: str) -> None:
-        self.parameters.save_parameters(file_name)
+    # outputs for a (batch, inputs) array, the values buttons show stay untouched
+    def calculate_batch_outputs(self, inputs: np.ndarray) -> np.ndarray:
+        inputs = np.asarray(inputs, dtype=self.dtype)
+        for layer in self.layers:
+            inputs = layer.calculate_batch(inputs)
+        return inputs.copy()
+
+    def save_parameters(self, file_name: str, binary: bool=False) -> None:
+        self.parameters.save_parameters(file_name, binary)
 
     def cost(self, inputs: ndarray, expected_outputs: ndarray) -> float:
-        return np.array([ (self.node_cost(self.calculate_outputs(inputs[index]), expected_outputs[index])).sum() 
-                         for index in range(len(inputs)) ]).sum() / len(inputs)
+        return self.node_cost(self.calculate_batch_outputs(inputs), np.asarray(expected_outputs, dtype=self.dtype)).sum() / len(inputs)
 
+    # gradient averaged over the batch, every layer works on the whole (batch, nodes) array at once:
+    # weight gradients are delta.T @ activations, which sums the outer products of all samples
     def backpropagation(self, inputs: ndarray, expected_outputs: ndarray) -> Parameters:
         
-        gradient = NeuralNetwork.Parameters.zeros(self.layer_sizes)
+        gradient = NeuralNetwork.Parameters.zeros(self.layer_sizes, self.dtype)
+        inputs = np.asarray(inputs, dtype=self.dtype)
         
-        for inp, ex_out in zip(inputs, expected_outputs):
-            
-            impact_values = self.derivative_node_cost(self.calculate_outputs(inp), ex_out)
+        impact_values = self.derivative_node_cost(self.calculate_batch_outputs(inputs), np.asarray(expected_outputs, dtype=self.dtype))
 
-            for index in reversed(range(len(self.layers))):
+        for index in reversed(range(len(self.layers))):
 
-                layer = self.layers[index]
+            layer = self.layers[index]
 
-                if index > 0:
-                    previous_activations = self.layers[index - 1].activation_values  # reference
-                else:
-                    previous_activations = inp  # reference
+            if index > 0:
+                previous_activations = self.layers[index - 1].batch_activation_values  # reference
+            else:
+                previous_activations = inputs  # reference
 
-                delta = impact_values * layer.derivative_function(layer.weighted_sum_values)
+            delta = impact_values * layer.derivative_function(layer.batch_weighted_sum_values)
 
-                gradient.weights[index] += np.outer(delta, previous_activations)
-                gradient.biases[index] += delta
-            
-                if index > 0:
-                    impact_values = np.dot(delta, layer.weights)
+            np.matmul(delta.T, previous_activations, out=gradient.weights[index])
+            np.sum(delta, axis=0, out=gradient.biases[index])
+        
+            if index > 0:
+                impact_values = np.matmul(delta, layer.weights)
         
         for weight, bias in zip(gradient.weights, gradient.biases):
             weight /= len(inputs)
@@ -218,7 +374,9 @@ class NeuralNetwork:
 
         return gradient
                 
+    # interface_units (and pygame with it) is imported only here, so networks can be used without a display
     def init_interface_units(self, screen_size: tuple[int, int]) -> None:
+        from CrazySnakeAI.interface_units import MaxValues, CircleButton, LineButton
         
         max_screen_occupation = ( round(screen_size[0] * 0.7), round(screen_size[1] * 0.7))
         desired_spacings = (screen_size[0] // 6, screen_size[1] // 6)
@@ -310,7 +468,7 @@ class NeuralNetwork:
     def update_max_values(self, output_max: float=None) -> None:
         self.max_values.update(self, output_max)
         
-    def draw(self, screen: py.Surface) -> None:
+    def draw(self, screen: 'py.Surface') -> None:
         for lb in self.line_buttons:
             lb.draw(screen)
         for cb in self.circle_buttons:
@@ -319,6 +477,8 @@ class NeuralNetwork:
             self.board.draw(screen)
             
     def is_clicked(self, point_pos) -> bool:
+        from CrazySnakeAI.interface_units import Board, Button
+        
         for cb in self.circle_buttons:
             if cb.is_point_inside(point_pos):
                 cb.click()
@@ -372,7 +532,7 @@ def gradient_descent(network: NeuralNetwork, training_inputs: ndarray, expected_
 
         if logs:
             print('\r' + (' ' * len(line)), end='')
-            if test_inputs != None:
+            if test_inputs is not None:
                 total_error = network.cost(test_inputs, test_outputs)
                 print(f'\rEpoch {epoch}, Error: {total_error}')
     
@@ -392,11 +552,11 @@ def gradient_descent_adam_optimization(network: NeuralNetwork, training_inputs:
     
     # Momentums
 
-    V_t = NeuralNetwork.Parameters.zeros(network.layer_sizes)
-    S_t = NeuralNetwork.Parameters.zeros(network.layer_sizes)
+    V_t = NeuralNetwork.Parameters.zeros(network.layer_sizes, network.dtype)
+    S_t = NeuralNetwork.Parameters.zeros(network.layer_sizes, network.dtype)
 
-    V_corr = NeuralNetwork.Parameters.zeros(network.layer_sizes)
-    S_corr = NeuralNetwork.Parameters.zeros(network.layer_sizes)
+    V_corr = NeuralNetwork.Parameters.zeros(network.layer_sizes, network.dtype)
+    S_corr = NeuralNetwork.Parameters.zeros(network.layer_sizes, network.dtype)
 
     t = 1
 
@@ -439,7 +599,7 @@ def gradient_descent_adam_optimization(network: NeuralNetwork, training_inputs:
 
         if logs:
             print('\r' + (' ' * len(line)), end='')
-            if test_inputs != None:
+            if test_inputs is not None:
                 total_error = network.cost(test_inputs, test_outputs)
                 print(f'\rEpoch {epoch}, Error: {total_error}')
             
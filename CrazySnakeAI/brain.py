@@ -1,8 +1,11 @@
 from CrazySnakeAI.SnakeAI import NeuralNetwork, CostFunctions, ActivationFunctions
-from ClassClaster import Field, Snake, SpeedState, State, Position
-from numpy import ndarray, argmin, argmax, zeros
+import weakref
+from simulation import Field, Snake, SpeedState, State, Position, NO_OWNER
+from numpy import ndarray, argmax, argmin, array, float32, sign, where, zeros
 
 actions = (State.HEAD_UP, State.HEAD_RIGHT, State.HEAD_DOWN, State.HEAD_LEFT)
+ACTION_X = array([action.value.x for action in actions])
+ACTION_Y = array([action.value.y for action in actions])
 
 def start_game(snake: Snake):
     snake.set_speed_state(SpeedState.ACCELERATION)
@@ -10,90 +13,133 @@ def start_game(snake: Snake):
 def distance(pos1: Position, pos2: Position):
     return abs(pos1.x - pos2.x) + abs(pos1.y - pos2.y)
 
-def is_inside(pos):
-    if pos.x < 0 or pos.x >= 25:
-        return False
-    if pos.y < 0 or pos.y >= 25:
-        return False
-    return True
-
 def get_optimal_target(field: Field, pos: Position) -> Position:
-    food = []
-    dis = []
-
-    for y, row in enumerate(field.field):
-        for x, square in enumerate(row):
-            if square.state == State.APPLE or square.state == State.SNACK:
-                food.append(Position(x, y))
+    target = field.food.nearest_manhattan(pos)
     
-    if len(food) == 0:
-        if pos != Position(12,12):
-            return Position(12, 12)
+    # no food - head to the center of the board
+    if target is None:
+        center = field.rules.center()
+        if pos != center:
+            return center
         else:
-            return Position(13, 13)
-
-    for target in food:
-        dis.append(distance(target, pos))
+            return center + Position(1, 1)
        
-    return food[ argmin(dis) ]
+    return target
 
 #   0
 # 3   1
 #   2
 
-def get_state(field: Field, snake: Snake) -> ndarray:
-    state = zeros(6)
-    #state = zeros(4)
+# observations of all snakes of a field, built in one pass and reused until the field's tick moves on
+# (or the board changes in between, e.g. when a snake drops food starting to sprint)
+class Observations:
+    def __init__(self, field: Field) -> None:
+        self.field = field
+        self.states = zeros((0, 6), dtype=float32)  # one row per snake, grows when snakes are added
+        self.rows = {}  # snake -> row in states
+        self.key = None
+
+    def get(self, snake: Snake) -> ndarray:
+        key = (self.field.tick, self.field.version)
+        if self.key != key or snake not in self.rows:
+            self.build()
+            self.key = key
+        return self.states[self.rows[snake]]  # view, overwritten by the next build
+
+    def build(self) -> None:
+        field = self.field
+        snakes = field.snakes
+        if len(snakes) > len(self.states):
+            self.states = zeros((max(len(snakes), 2 * len(self.states)), 6), dtype=float32)
+        self.rows = {snake: row for row, snake in enumerate(snakes)}
+        states = self.states[:len(snakes)]
+        states.fill(0)
+
+        alive = array([len(snake.snake) > 0 for snake in snakes], dtype=bool)
+        heads = [snake.snake[0] for snake in snakes if len(snake.snake) > 0]
+        if len(heads) == 0:
+            return
+        head_x = array([head.x for head in heads])
+        head_y = array([head.y for head in heads])
+
+        # nearest food by manhattan distance, ties in row-major order like FoodIndex.nearest
+        if len(field.food) > 0:
+            food_x = array([food.x for food in field.food])
+            food_y = array([food.y for food in field.food])
+            cost = abs(food_x[None, :] - head_x[:, None]) + abs(food_y[None, :] - head_y[:, None])
+            nearest = argmin((cost * field.height + food_y[None, :]) * field.width + food_x[None, :], axis=1)
+            target_x = food_x[nearest]
+            target_y = food_y[nearest]
+        else:
+            # no food - head to the center of the board
+            center = field.rules.center()
+            at_center = (head_x == center.x) & (head_y == center.y)
+            target_x = where(at_center, center.x + 1, center.x)
+            target_y = where(at_center, center.y + 1, center.y)
+
+        observed = zeros((len(heads), 6))
+        # squares around the head, in the order of actions: outside the field or taken by a snake
+        x = head_x[:, None] + ACTION_X
+        y = head_y[:, None] + ACTION_Y
+        inside = (x >= 0) & (x < field.width) & (y >= 0) & (y < field.height)
+        observed[:, :4] = ~inside | (field.owners[where(inside, y, 0), where(inside, x, 0)] != NO_OWNER)
+        # direction to the target, -1, 0 or 1 on each axis
+        observed[:, -2] = sign(target_x - head_x)
+        observed[:, -1] = sign(target_y - head_y)
+        states[alive] = observed
+
+
+# same row as Observations makes, for a single snake
+def snake_state(field: Field, snake: Snake) -> ndarray:
+    state = zeros(6, dtype=float32)
     if len(snake.snake) == 0:
         return state
-    snake_pos = snake.snake[0]
-    
-    positions_around = [move.value + snake_pos for move in actions]
-    
-    target_pos = get_optimal_target(field, snake_pos)
-    target_pos -= snake_pos
-
-    # up
-    if target_pos.y < 0:
-        state[0] = 5
-        target_pos.y = -1
-    # down
-    elif target_pos.y > 0:
-        state[2] = 5
-        target_pos.y = 1
-        
-    # left
-    if target_pos.x < 0:
-        state[3] = 5
-        target_pos.x = -1
-    # right
-    elif target_pos.x > 0:
-        state[1] = 5
-        target_pos.x = 1    
-
-    state[-2] = target_pos.x
-    state[-1] = target_pos.y
-
-    for i, pos in enumerate(positions_around):
-        if not is_inside(pos):
-            state[i] = 1
-            continue
-        
-        if field.get_square(pos).snake == None:
-            state[i] = 0
-        else:
-            state[i] = 1
-                
+    head = snake.snake[0]
+    for index, action in enumerate(actions):
+        position = field.neighbour(head, action)
+        if position is None or field.get_square_snake(position) is not None:
+            state[index] = 1
+    target = get_optimal_target(field, head)
+    state[-2] = (target.x > head.x) - (target.x < head.x)
+    state[-1] = (target.y > head.y) - (target.y < head.y)
     return state
 
-network = NeuralNetwork(NeuralNetwork.Parameters.file('CrazySnakeAI/ta.enjoyer'), CostFunctions.Quadratic_Cost_Function, 
-                       [ ActivationFunctions.ReLU,
-                        ActivationFunctions.ReLU,
-                        ActivationFunctions.ReLU,
-                        ActivationFunctions.linear ]
-                       )
+
+# observations are kept per field between calls
+_observations = weakref.WeakKeyDictionary()
+
+# fields with at most this many snakes (every real game has two) are observed snake by snake,
+# building all rows at once only pays off for more of them
+SMALL_FIELD_SNAKES = 8
+
+
+def get_state(field: Field, snake: Snake) -> ndarray:
+    if len(field.snakes) <= SMALL_FIELD_SNAKES:
+        return snake_state(field, snake)
+    observations = _observations.get(field)
+    if observations is None:
+        observations = _observations[field] = Observations(field)
+    # a copy, like snake_state gives, so callers can keep states of earlier ticks
+    return observations.get(snake).copy()
+
+# loaded on the first call, so importing this module costs nothing
+_network = None
+
+# float32 is enough for playing and halves the work of every step; ta.enjoyer.bin is ta.enjoyer converted
+# with convert_parameters, memory-mapped and shared by every process instead of parsed by each of them
+def get_network() -> NeuralNetwork:
+    global _network
+    if _network is None:
+        _network = NeuralNetwork(NeuralNetwork.Parameters.file('CrazySnakeAI/ta.enjoyer.bin', float32), CostFunctions.Quadratic_Cost_Function, 
+                                [ ActivationFunctions.ReLU,
+                                 ActivationFunctions.ReLU,
+                                 ActivationFunctions.ReLU,
+                                 ActivationFunctions.linear ],
+                                copy_parameters=False
+                                )
+    return _network
 
 def act(field: Field, snake: Snake) -> State:
     state = get_state(field, snake)
-    action_index = argmax( network.calculate_outputs(state) )
+    action_index = argmax( get_network().calculate_outputs(state) )
     return actions[action_index]
\ No newline at end of file
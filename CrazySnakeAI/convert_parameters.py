@@ -0,0 +1,20 @@
+import argparse
+from CrazySnakeAI.SnakeAI import NeuralNetwork
+
+# Converts text parameter files (like ta.enjoyer or aboba.lover) to the binary, memory-mappable format.
+# Run from the root of the project: python -m CrazySnakeAI.convert_parameters CrazySnakeAI/ta.enjoyer out.bin
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Converts CrazySnakeAI parameter files to the binary format")
+    parser.add_argument('input', help="text (or binary) parameter file")
+    parser.add_argument('output', help="binary parameter file to write")
+    parser.add_argument('--dtype', default='float32', choices=['float32', 'float64'])
+    args = parser.parse_args()
+
+    parameters = NeuralNetwork.Parameters.file(args.input, args.dtype)
+    parameters.save_parameters(args.output, binary=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,325 @@
+import numpy as np
+from simulation import State, SpeedState, LiveState, Rules, CODE_STATES, STATE_CODES, EMPTY_CODE, SNACK_CODE, \
+    APPLE_CODE, NO_OWNER
+
+# Runs the rules of simulation.Snake.move for a batch of independent games at once.
+# Every game is a (height, width) slice of the batch arrays, snakes of a game are updated
+# in index order, all games are updated together with numpy operations.
+
+# directions in the same order as actions of the AIs
+DIRECTIONS = (State.HEAD_UP, State.HEAD_RIGHT, State.HEAD_DOWN, State.HEAD_LEFT)
+# action = direction index, + SPRINT to move with SpeedState.ACCELERATION
+SPRINT = len(DIRECTIONS)
+
+TAIL_CODE = STATE_CODES[State.TAIL]
+
+_DX = np.array([direction.value.x for direction in DIRECTIONS])
+_DY = np.array([direction.value.y for direction in DIRECTIONS])
+_HEAD_CODES = np.array([STATE_CODES[direction] for direction in DIRECTIONS], dtype=np.int8)
+
+# growth given by a square, indexed by cell code
+_FOOD_VALUES = np.zeros(len(CODE_STATES), dtype=np.int32)
+_FOOD_VALUES[SNACK_CODE] = State.SNACK.value
+_FOOD_VALUES[APPLE_CODE] = State.APPLE.value
+
+# same defaults as game_window
+SNACK_SPAWN = 200
+APPLE_SPAWN = 800
+MATCH_TICKS = 2 * 60 * 60
+
+
+class BatchEnvironment:
+    # rules default to the classic 25x25 board, head_positions to rules.start_positions()
+    def __init__(self, batch_size: int, rules: Rules = None,
+                 head_positions: tuple[tuple[int, int], ...] = None, facing: State = State.HEAD_RIGHT,
+                 length: int = 6, live: LiveState = LiveState.REVIVABLE, coyote_death_time: int = 3,
+                 drop_start_sprint: bool = True, sprint_lose_weight: int = 30, odd_when_dying: float = 0.5,
+                 snack_spawn: int = SNACK_SPAWN, apple_spawn: int = APPLE_SPAWN, match_ticks: int = MATCH_TICKS,
+                 seed: int = None) -> None:
+        if rules is None:
+            rules = Rules()
+        if head_positions is None:
+            head_positions = tuple((position.x, position.y) for position in rules.start_positions())
+        self.batch_size = int(batch_size)
+        self.rules = rules
+        self.width = rules.width
+        self.height = rules.height
+        self.n_snakes = len(head_positions)
+        self.area = rules.area
+
+        self.START_TAIL_LENGTH = length - 1
+        self.LIVE_STATE = live
+        self.COYOTE_DEATH_TIME = coyote_death_time
+        self.DROP_START_SPRINT = drop_start_sprint
+        self.SPRINT_LOSE_WEIGHT = sprint_lose_weight
+        self.ODD_WHEN_DYING = odd_when_dying
+        self.SNACK_SPAWN = snack_spawn
+        self.APPLE_SPAWN = apple_spawn
+        self.MATCH_TICKS = match_ticks
+
+        self.rng = np.random.default_rng(seed)
+
+        shape = (self.batch_size, self.n_snakes)
+        self.cells = np.empty((self.batch_size, self.height, self.width), dtype=np.int8)
+        self.owners = np.empty((self.batch_size, self.height, self.width), dtype=np.int16)
+        # flat views, cell index = y * width + x
+        self.cells_flat = self.cells.reshape(self.batch_size, self.area)
+        self.owners_flat = self.owners.reshape(self.batch_size, self.area)
+
+        # ring buffer of body cells for every snake, head at head_ptr, tail at head_ptr + length - 1
+        self.body = np.zeros(shape + (self.area,), dtype=np.int32)
+        self.head_ptr = np.zeros(shape, dtype=np.int32)
+        self.length = np.zeros(shape, dtype=np.int32)
+
+        self.direction = np.zeros(shape, dtype=np.int8)  # index into DIRECTIONS
+        self.food = np.zeros(shape, dtype=np.int32)
+        self.move_timer = np.zeros(shape, dtype=np.int32)
+        self.sprint = np.zeros(shape, dtype=bool)
+        self.sprint_lose_weight_timer = np.zeros(shape, dtype=np.int32)
+        self.near_death_counter = np.zeros(shape, dtype=np.int32)
+        self.revive_timer = np.zeros(shape, dtype=np.int32)
+        self.to_remove = np.zeros(shape, dtype=bool)
+        self.removed = np.zeros(shape, dtype=bool)  # LiveState.ONE_TIME snakes that are gone for good
+
+        self.snack_spawn_timer = np.zeros(self.batch_size, dtype=np.int32)
+        self.apple_spawn_timer = np.zeros(self.batch_size, dtype=np.int32)
+        self.tick = np.zeros(self.batch_size, dtype=np.int32)
+
+        # statistics of the running games and of the last finished game on every board
+        self.eaten = np.zeros(shape, dtype=np.int32)
+        self.deaths = np.zeros(shape, dtype=np.int32)
+        self.final_length = np.zeros(shape, dtype=np.int32)
+        self.final_eaten = np.zeros(shape, dtype=np.int32)
+        self.final_deaths = np.zeros(shape, dtype=np.int32)
+
+        self._build_start(head_positions, facing)
+        self.reset()
+
+    # lays out the starting board once, reset copies it
+    def _build_start(self, head_positions: tuple[tuple[int, int], ...], facing: State) -> None:
+        self.start_cells = np.full(self.area, EMPTY_CODE, dtype=np.int8)
+        self.start_owners = np.full(self.area, NO_OWNER, dtype=np.int16)
+        self.start_body = np.zeros((self.n_snakes, self.area), dtype=np.int32)
+        self.start_direction = DIRECTIONS.index(facing)
+
+        for snake, (x, y) in enumerate(head_positions):
+            for i in range(self.START_TAIL_LENGTH + 1):
+                if not (0 <= x < self.width and 0 <= y < self.height):
+                    raise ValueError("Snake " + str(snake) + " does not fit into the field")
+                cell = y * self.width + x
+                if self.start_cells[cell] != EMPTY_CODE:
+                    raise ValueError("Snake " + str(snake) + " overlaps another snake")
+                self.start_cells[cell] = _HEAD_CODES[self.start_direction] if i == 0 else TAIL_CODE
+                self.start_owners[cell] = snake + 1
+                self.start_body[snake, i] = cell
+                x -= facing.value.x
+                y -= facing.value.y
+
+    def reset(self, boards: np.ndarray = None) -> None:
+        if boards is None:
+            boards = np.arange(self.batch_size)
+
+        self.cells_flat[boards] = self.start_cells
+        self.owners_flat[boards] = self.start_owners
+        self.body[boards] = self.start_body
+        self.head_ptr[boards] = 0
+        self.length[boards] = self.START_TAIL_LENGTH + 1
+
+        self.direction[boards] = self.start_direction
+        for array in (self.food, self.move_timer, self.sprint_lose_weight_timer, self.near_death_counter,
+                      self.revive_timer, self.eaten, self.deaths):
+            array[boards] = 0
+        for array in (self.sprint, self.to_remove, self.removed):
+            array[boards] = False
+
+        self.snack_spawn_timer[boards] = self.SNACK_SPAWN
+        self.apple_spawn_timer[boards] = self.APPLE_SPAWN
+        self.tick[boards] = 0
+
+    # actions[batch_size, n_snakes], returns mask of games that ended (and were reset) on this step
+    def step(self, actions: np.ndarray) -> np.ndarray:
+        actions = np.asarray(actions)
+
+        self._spawn_food(self.apple_spawn_timer, self.APPLE_SPAWN, APPLE_CODE)
+        self._spawn_food(self.snack_spawn_timer, self.SNACK_SPAWN, SNACK_CODE)
+
+        for snake in range(self.n_snakes):
+            self._set_speed_state(snake, actions[:, snake] >= SPRINT)
+            self._move(snake, actions[:, snake] % SPRINT)
+        self._remove_snakes()
+
+        self.tick += 1
+        done = self.tick >= self.MATCH_TICKS
+        if done.any():
+            boards = np.flatnonzero(done)
+            self.final_length[boards] = self.length[boards]
+            self.final_eaten[boards] = self.eaten[boards]
+            self.final_deaths[boards] = self.deaths[boards]
+            self.reset(boards)
+        return done
+
+    # returns random empty cell of every board and mask of boards that had one
+    def _random_free_cells(self, boards: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        free = self.cells_flat[boards] == EMPTY_CODE
+        keys = self.rng.random(free.shape)
+        keys[~free] = -1.0
+        return keys.argmax(axis=1), free.any(axis=1)
+
+    def _spawn_food(self, timer: np.ndarray, period: int, code: int) -> None:
+        boards = np.flatnonzero(timer == 0)
+        if len(boards) > 0:
+            cells, found = self._random_free_cells(boards)
+            self.cells_flat[boards[found], cells[found]] = code
+            timer[boards] = period
+        timer -= 1
+
+    def _set_speed_state(self, snake: int, sprint: np.ndarray) -> None:
+        boards = np.flatnonzero((sprint != self.sprint[:, snake]) & ~self.removed[:, snake])
+        if len(boards) == 0:
+            return
+        self.sprint[boards, snake] = sprint[boards]
+        self.move_timer[boards, snake] = 0
+        started = boards[sprint[boards]]
+        self.sprint_lose_weight_timer[started, snake] = 0
+        if self.DROP_START_SPRINT:
+            self._lose_weight(started, snake)
+
+    def _tail_cells(self, boards: np.ndarray, snake: int) -> np.ndarray:
+        tail_ptr = (self.head_ptr[boards, snake] + self.length[boards, snake] - 1) % self.area
+        return self.body[boards, snake, tail_ptr]
+
+    def _lose_weight(self, boards: np.ndarray, snake: int) -> None:
+        boards = boards[self.length[boards, snake] > 1]
+        tails = self._tail_cells(boards, snake)
+        self.length[boards, snake] -= 1
+        self.cells_flat[boards, tails] = SNACK_CODE
+        self.owners_flat[boards, tails] = NO_OWNER
+
+    def _move(self, snake: int, direction: np.ndarray) -> None:
+        revive_timer = self.revive_timer[:, snake]
+        move_timer = self.move_timer[:, snake]
+
+        # revive, or wait to revive; reviving takes the whole tick, like in Snake.start_move
+        reviving = revive_timer == 1
+        self._revive(np.flatnonzero(reviving), snake)
+        revive_timer[revive_timer > 1] -= 1
+
+        # wait for a move
+        alive = (revive_timer == 0) & ~reviving & ~self.removed[:, snake]
+        ready = alive & (move_timer == 0)
+        move_timer[alive & ~ready] -= 1
+        boards = np.flatnonzero(ready)
+        if len(boards) == 0:
+            return
+        move_timer[boards] = np.where(self.sprint[boards, snake], SpeedState.ACCELERATION.value,
+                                      SpeedState.NORMAL.value)
+
+        head_ptr = self.head_ptr[boards, snake]
+        heads = self.body[boards, snake, head_ptr]
+        head_x = heads % self.width
+        head_y = heads // self.width
+
+        # turn unless moving into own tail
+        wanted = direction[boards]
+        necks = self.body[boards, snake, (head_ptr + 1) % self.area]
+        into_neck = ((head_x + _DX[wanted] == necks % self.width)
+                     & (head_y + _DY[wanted] == necks // self.width))
+        turn = (self.length[boards, snake] <= 1) | ~into_neck
+        facing = np.where(turn, wanted, self.direction[boards, snake]).astype(np.int8)
+        self.direction[boards, snake] = facing
+
+        new_x = head_x + _DX[facing]
+        new_y = head_y + _DY[facing]
+        inside = (new_x >= 0) & (new_x < self.width) & (new_y >= 0) & (new_y < self.height)
+        targets = np.where(inside, new_y * self.width + new_x, 0)
+        states = self.cells_flat[boards, targets]
+        food_values = _FOOD_VALUES[states]
+        # squares with food or nothing on them, crashing into own tail is covered by TAIL
+        free = inside & ((states == EMPTY_CODE) | (food_values > 0))
+
+        self._dying_check(boards[~free], snake, facing[~free])
+
+        boards = boards[free]
+        if len(boards) == 0:
+            return
+        targets = targets[free]
+        facing = facing[free]
+        old_heads = heads[free]
+        eaten = food_values[free]
+
+        self.food[boards, snake] += eaten
+        self.eaten[boards, snake] += eaten > 0
+        self.near_death_counter[boards, snake] = 0
+
+        sprinting = boards[self.sprint[boards, snake]]
+        sprint_timer = self.sprint_lose_weight_timer[sprinting, snake]
+        lose = sprint_timer == self.SPRINT_LOSE_WEIGHT
+        self.sprint_lose_weight_timer[sprinting, snake] = np.where(lose, 0, sprint_timer + 1)
+        self._lose_weight(sprinting[lose], snake)
+
+        self.cells_flat[boards, old_heads] = TAIL_CODE  # making old head a tail
+        growing = self.food[boards, snake] != 0
+        self.food[boards[growing], snake] -= 1
+        shrinking = boards[~growing]
+        tails = self._tail_cells(shrinking, snake)  # delete tail
+        self.cells_flat[shrinking, tails] = EMPTY_CODE
+        self.owners_flat[shrinking, tails] = NO_OWNER
+        self.length[shrinking, snake] -= 1
+
+        self._push_head(boards, snake, targets, facing)
+
+    def _push_head(self, boards: np.ndarray, snake: int, cells: np.ndarray, facing: np.ndarray) -> None:
+        head_ptr = (self.head_ptr[boards, snake] - 1) % self.area
+        self.head_ptr[boards, snake] = head_ptr
+        self.body[boards, snake, head_ptr] = cells
+        self.length[boards, snake] += 1
+        self.cells_flat[boards, cells] = _HEAD_CODES[facing]
+        self.owners_flat[boards, cells] = snake + 1
+
+    def _dying_check(self, boards: np.ndarray, snake: int, facing: np.ndarray) -> None:
+        coyote = self.near_death_counter[boards, snake] != self.COYOTE_DEATH_TIME
+        near = boards[coyote]
+        self.near_death_counter[near, snake] += 1
+        heads = self.body[near, snake, self.head_ptr[near, snake]]
+        self.cells_flat[near, heads] = _HEAD_CODES[facing[coyote]]
+
+        dead = boards[~coyote]
+        self.to_remove[dead, snake] = True
+        if self.LIVE_STATE != LiveState.ONE_TIME:
+            self.revive_timer[dead, snake] = self.LIVE_STATE.value
+            self.near_death_counter[dead, snake] = 0
+
+    def _revive(self, boards: np.ndarray, snake: int) -> None:
+        if len(boards) == 0:
+            return
+        # direction is same as before death
+        self.food[boards, snake] = self.START_TAIL_LENGTH
+        self.move_timer[boards, snake] = 0
+        self.sprint_lose_weight_timer[boards, snake] = 0
+
+        cells, found = self._random_free_cells(boards)
+        boards = boards[found]
+        self.revive_timer[boards, snake] = 0
+        self._push_head(boards, snake, cells[found], self.direction[boards, snake])
+
+    def _remove_snakes(self) -> None:
+        boards, snakes = np.nonzero(self.to_remove)
+        if len(boards) == 0:
+            return
+        lengths = self.length[boards, snakes]
+        segment_boards = np.repeat(boards, lengths)
+        segment_snakes = np.repeat(snakes, lengths)
+        offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        segments = self.body[segment_boards, segment_snakes,
+                             (self.head_ptr[segment_boards, segment_snakes] + offsets) % self.area]
+
+        # leave some mats
+        dropped = self.rng.random(len(segments)) <= self.ODD_WHEN_DYING
+        self.cells_flat[segment_boards, segments] = np.where(dropped, EMPTY_CODE, SNACK_CODE)
+        self.owners_flat[segment_boards, segments] = NO_OWNER
+
+        self.length[boards, snakes] = 0
+        self.deaths[boards, snakes] += 1
+        self.to_remove[boards, snakes] = False
+        if self.LIVE_STATE == LiveState.ONE_TIME:
+            self.removed[boards, snakes] = True
@@ -0,0 +1,78 @@
+import argparse
+import random
+
+import numpy as np
+
+from simulation import Field, Rules, Position, State, SpeedState, LiveState, STATE_CODES
+from batch_env import BatchEnvironment, DIRECTIONS, SPRINT
+
+# Checks that BatchEnvironment follows simulation.Snake.move board for board, deaths and revives included:
+#   python check_batch_env.py --games 50
+# Both sides get the same random actions and the same food. The batch takes its revive squares from the
+# Field, the only other random choice (dropping the body of a dead snake) is fixed by odd_when_dying=1.
+
+
+def check_game(seed: int, ticks: int, live: LiveState, rules: Rules = Rules(12, 9)) -> None:
+    rnd = random.Random(seed)
+    random.seed(seed)  # Field picks free squares with the module random
+    heads = ((4, 2), (7, 6))
+    env = BatchEnvironment(1, rules, heads, length=4, live=live, coyote_death_time=2, sprint_lose_weight=3,
+                           odd_when_dying=1.0, snack_spawn=10 ** 9, apple_spawn=10 ** 9, match_ticks=10 ** 9)
+    field = Field(rules)
+    snakes = [field.spawn_snake(Position(x, y), State.HEAD_RIGHT, 4, live, 2, True, 3, 1.0) for x, y in heads]
+
+    # revives of the batch go to the squares the Field picked on the same tick
+    revived = []
+
+    def revive_cells(boards: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        if len(revived) == 0:
+            return np.zeros(1, dtype=int), np.array([False])  # no free square on the Field either
+        position = revived.pop(0)
+        return np.array([position.y * rules.width + position.x]), np.array([True])
+
+    env._random_free_cells = revive_cells
+
+    for tick in range(ticks):
+        if tick % 5 == 0:
+            position = field.rand_free_position()
+            if position is not None:
+                state = rnd.choice([State.APPLE, State.SNACK])
+                field.add_food(position, state)
+                env.cells[0, position.y, position.x] = STATE_CODES[state]
+
+        actions = np.array([[rnd.randrange(2 * SPRINT) for snake in snakes]])
+        for index, snake in enumerate(snakes):
+            if snake not in field.snakes:
+                continue
+            speed = SpeedState.ACCELERATION if actions[0, index] >= SPRINT else SpeedState.NORMAL
+            if speed != snake.speed_state:
+                snake.set_speed_state(speed)
+            reviving = snake.revive_timer == 1
+            snake.move(DIRECTIONS[actions[0, index] % SPRINT])
+            if reviving and snake.revive_timer == 0:
+                revived.append(snake.snake[0])
+        field.remove_snakes()
+        env.step(actions)
+
+        if not (env.cells[0] == field.cells).all():
+            raise AssertionError(f"seed {seed}, tick {tick}: boards differ\n{env.cells[0]}\n{field.cells}")
+        for index, snake in enumerate(snakes):
+            if (env.length[0, index], env.move_timer[0, index], env.revive_timer[0, index]) != \
+                    (len(snake.snake), snake.move_timer, snake.revive_timer):
+                raise AssertionError(f"seed {seed}, tick {tick}: snake {index} differs")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compares BatchEnvironment with simulation.Snake.move")
+    parser.add_argument('--games', type=int, default=20)
+    parser.add_argument('--ticks', type=int, default=3000)
+    args = parser.parse_args()
+
+    for seed in range(args.games):
+        live = LiveState.REVIVABLE if seed % 2 == 0 else LiveState.ONE_TIME
+        check_game(seed, args.ticks, live)
+    print(f"{args.games} games match")
+
+
+if __name__ == '__main__':
+    main()
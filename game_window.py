@@ -1,25 +1,52 @@
+import sys
+import time
+
+# --profile-startup prints how long every phase of the start took, up to the first frame on screen.
+# Everything the main menu doesn't need (music, AI network, fonts of the other window size) is loaded
+# in the background or when it is used first.
+PROFILE_STARTUP = '--profile-startup' in sys.argv
+STARTUP_BUDGET = 0.5  # In seconds, time to the first frame
+startup_time = time.perf_counter()
+phase_time = startup_time
+startup_phases = []  # (phase, seconds), background phases are added when they finish
+startup_reported = False
+
+
+# ends the current phase of the start
+def startup_phase(name: str) -> None:
+    global phase_time
+    current_time = time.perf_counter()
+    startup_phases.append((name, current_time - phase_time))
+    phase_time = current_time
+
+
 from screeninfo import get_monitors
 from interface_utils import *
 from ClassClaster import *
 from enum import Enum
 import math
 import os
+import threading
 
-import CrazySnakeAI.brain as CAi
+import CrazySnakeAI.brain as CAi  # its network is loaded on the first CAi.act
 
 from tymko_algo import get_direction
 
+startup_phase("imports")
+
 # Size of user's monitor
-MONITOR_WIDTH = get_monitors()[0].width
-MONITOR_HEIGHT = get_monitors()[0].height
+MONITOR = get_monitors()[0]
+MONITOR_WIDTH = MONITOR.width
+MONITOR_HEIGHT = MONITOR.height
+startup_phase("monitors")
 
 # Current size of game window
 width = MONITOR_WIDTH / 2
 height = MONITOR_HEIGHT / 2
 
 field_size = height * 0.85
-FIELD_SQUARE_SIZE = 25
-field = Field(height * 0.075, height * 0.075, FIELD_SQUARE_SIZE, field_size)
+RULES = Rules(25, 25)  # size of the board in squares
+field = Field(height * 0.075, height * 0.075, RULES, field_size)
 d_snake = None
 t_snake = None
 
@@ -29,25 +56,56 @@ LIGHT_BACKGROUND_COLOR = color("577590")
 TEXT_COLOR = color("F9C74F")
 os.environ['SDL_VIDEO_CENTERED'] = '1'  # Centers the window
 
-py.init()
-py.mixer.init()
-py.mixer.music.load("8-bit-arcade.wav")
-py.mixer.music.set_volume(0.7)
-py.mixer.music.play(-1)
+MUSIC_FILE = "8-bit-arcade.wav"
+
+
+# runs in the background while the menu is already showing
+def start_music() -> None:
+    music_time = time.perf_counter()
+    try:
+        if not py.mixer.get_init():
+            py.mixer.init()
+        py.mixer.music.load(MUSIC_FILE)
+        py.mixer.music.set_volume(0.7)
+        py.mixer.music.play(-1)
+    except (py.error, FileNotFoundError):
+        pass  # no audio device or no music - keep playing silently
+    startup_phases.append(("music (background)", time.perf_counter() - music_time))
+
+
+# mixer is started by the music thread, other modules only when they are needed
+py.display.init()
+py.font.init()
+music_thread = threading.Thread(target=start_music, daemon=True)
+music_thread.start()
+startup_phase("pygame init")
 
 clock = py.time.Clock()
 screen = py.display.set_mode((width, height))
 py.display.set_caption("Змійка 3.2.15")
+startup_phase("window")
+
+
+# fonts are loaded once per size, the other window size loads its fonts on the first toggle
+_fonts = {}
+
+
+def get_font(size: int) -> py.font.Font:
+    if size not in _fonts:
+        _fonts[size] = py.font.Font("Rubik.ttf", size)
+    return _fonts[size]
 
 
 def start_game():
-    global game_state, BACKGROUND_COLOR
+    global game_state, BACKGROUND_COLOR, redraw_screen
     BACKGROUND_COLOR = color("263340")
     game_state = GameState.GAME
+    redraw_screen = True
 
     global field, d_snake, t_snake
-    d_snake = field.spawn_snake(Position(10, 6), State.HEAD_RIGHT, 6, LiveState.REVIVABLE, 3, True, 30, 0.5)
-    t_snake = field.spawn_snake(Position(20, 15), State.HEAD_RIGHT, 6, LiveState.REVIVABLE, 3, True, 30, 0.5)
+    d_position, t_position = RULES.start_positions()
+    d_snake = field.spawn_snake(d_position, State.HEAD_RIGHT, 6, LiveState.REVIVABLE, 3, True, 30, 0.5)
+    t_snake = field.spawn_snake(t_position, State.HEAD_RIGHT, 6, LiveState.REVIVABLE, 3, True, 30, 0.5)
 
     # CAi.start_game(d_snake)
     # CAi.start_game(t_snake)
@@ -65,14 +123,14 @@ def fullscreen():
     py.display.set_mode((width, height))
 
     global CAPTION_FONT, BUTTON_FONT, main_menu_buttons
-    CAPTION_FONT = py.font.Font("Rubik.ttf", int(width // 8))
-    BUTTON_FONT = py.font.Font("Rubik.ttf", int(height // 14))
+    CAPTION_FONT = get_font(int(width // 8))
+    BUTTON_FONT = get_font(int(height // 14))
     for button in main_menu_buttons:
         button.set_font(BUTTON_FONT)
 
     global field, field_size, graph, button_menu
     field_size = height * 0.85
-    field = Field(height * 0.075, height * 0.075, FIELD_SQUARE_SIZE, field_size)
+    field = Field(height * 0.075, height * 0.075, RULES, field_size)
     graph = Graph(2, height + 0.15 * (width - height), height // 14 * 4, 0.7 * (width - height), height // 14 * 3)
     button_menu = Button("Menu", BUTTON_FONT, (height + (width - height) / 2) / width, 0.85, screen, quit_game)
 
@@ -84,7 +142,7 @@ def quit_game():
 
 
 # Initializes buttons for main menu
-CAPTION_FONT, BUTTON_FONT = py.font.Font("Rubik.ttf", int(width // 8)), py.font.Font("Rubik.ttf", int(height // 14))
+CAPTION_FONT, BUTTON_FONT = get_font(int(width // 8)), get_font(int(height // 14))
 main_menu_buttons = []
 
 button_start = Button("Start", BUTTON_FONT, 0.5, 0.6, screen, start_game)
@@ -95,6 +153,7 @@ main_menu_buttons.append(button_start)
 
 button_start = Button("Quit", BUTTON_FONT, 0.5, 0.8, screen, quit_game)
 main_menu_buttons.append(button_start)
+startup_phase("fonts and buttons")
 
 
 class GameState(Enum):
@@ -126,14 +185,14 @@ snack_spawn_timer = SNACK_SPAWN
 apple_spawn_timer = APPLE_SPAWN
 
 
-def render_game(current_frame: int):
+# one step of the simulation, its speed doesn't depend on how fast frames are drawn
+def game_tick() -> None:
     global field, d_snake, t_snake
     global SNACK_SPAWN
     global APPLE_SPAWN
     global snack_spawn_timer
     global apple_spawn_timer
-
-    screen.fill(BACKGROUND_COLOR)
+    global TIMER, game_state, graph, previous_timer_text, panel_dirty
 
     if apple_spawn_timer == 0:
         field.random_spawn_apple()
@@ -145,25 +204,36 @@ def render_game(current_frame: int):
         snack_spawn_timer = SNACK_SPAWN
     snack_spawn_timer -= 1
 
-    # d_snake.move(CAi.act(field, d_snake))
-    # t_snake.move(CAi.act(field, t_snake))
-    t_snake.move(get_direction(field, t_snake))
-    d_snake.move(get_direction(field, d_snake))
-    field.remove_snakes()
-    field.draw(screen)
-    py.draw.line(screen, LIGHT_BACKGROUND_COLOR, (height, 0), (height, height), 3)
+    # field.resolve_tick({t_snake: CAi.act(field, t_snake), d_snake: CAi.act(field, d_snake)})
+    field.resolve_tick({t_snake: get_direction(field, t_snake), d_snake: get_direction(field, d_snake)})
+
+    if TIMER < 0:
+        game_state = GameState.GAME_OVER
+    text = get_timer_text()
+    TIMER -= 1
+
+    if previous_timer_text != text:
+        graph.add_data(len(field.snakes[0].snake), len(field.snakes[1].snake))
+        previous_timer_text = text
+        panel_dirty = True
+
+
+# returns rects of the screen that were repainted
+def render_game() -> list[py.Rect]:
+    return field.draw_dirty(screen) + render_panel()
 
 
 graph = Graph(2, height + 0.15 * (width - height), height // 14 * 4, 0.7 * (width - height), height // 14 * 3)
 previous_timer_text = ""
+panel_dirty = True  # side panel (timer, graph, menu button) has to be repainted
+redraw_screen = True
 
 button_menu = Button("Menu", BUTTON_FONT, (height + (width - height) / 2) / width, 0.85, screen, quit_game)
+startup_phase("game screen")
 
 
-def run_timer():
-    global TIMER, FPS, game_state, graph, field, previous_timer_text
-
-    current_time = TIMER / (FPS * 60)
+def get_timer_text() -> str:
+    current_time = TIMER / (TICK_RATE * 60)
     timer_text = ""
     if current_time < 10:
         timer_text += "0"
@@ -173,45 +243,112 @@ def run_timer():
     if current_time < 10:
         timer_text += "0"
     timer_text += str(int(current_time))
+    return timer_text
 
-    if TIMER < 0:
-        game_state = GameState.GAME_OVER
 
-    timer = BUTTON_FONT.render(timer_text, True, TEXT_COLOR)
+# returns rects of the screen that were repainted
+def render_panel() -> list[py.Rect]:
+    global panel_dirty
+
+    if not panel_dirty:
+        return []
+    panel_dirty = False
+
+    panel_rect = py.Rect(height - 2, 0, width - height + 2, height)
+    screen.fill(BACKGROUND_COLOR, panel_rect)
+    py.draw.line(screen, LIGHT_BACKGROUND_COLOR, (height, 0), (height, height), 3)
+    timer = BUTTON_FONT.render(previous_timer_text, True, TEXT_COLOR)
     timer_rect = timer.get_rect(center=(height + (width - height) // 2, height // 7))
     screen.blit(timer, timer_rect)
-    TIMER -= 1
-
-    if previous_timer_text != timer_text:
-        graph.add_data(len(field.snakes[0].snake), len(field.snakes[1].snake))
-        previous_timer_text = timer_text
     graph.draw(screen)
     button_menu.process()
+    return [panel_rect]
+
+
+def print_startup_profile() -> None:
+    total = time.perf_counter() - startup_time
+    for name, seconds in startup_phases:
+        print(f"{name:<24}{seconds * 1000:8.1f} ms")
+    if music_thread.is_alive():
+        print(f"{'music (background)':<24}{'loading':>11}")
+    budget = "within" if total <= STARTUP_BUDGET else "over"
+    print(f"{'time to first frame':<24}{total * 1000:8.1f} ms ({budget} the budget of {STARTUP_BUDGET * 1000:.0f} ms)")
 
 
 frame = 0
-FPS = 60  # In frames per second
-TIMER = 2 * 60 * FPS  # In minutes
+FPS = 60  # In frames per second, only limits drawing
+TICK_RATE = 60  # In simulation ticks per second, SpeedState and LiveState values are in ticks
+TICK_TIME = 1 / TICK_RATE
+MAX_TICKS_PER_FRAME = 10  # if the simulation itself can't keep up, the rest of the lag is dropped
+TURBO_DRAW_EVERY = 10  # in turbo mode (T key) simulation runs as fast as possible, drawing every Nth tick
+TIMER = 2 * 60 * TICK_RATE  # In minutes
 game_state = GameState.MAIN_MENU
+turbo = False
+lag = 0.0  # simulation time not yet simulated
+previous_time = time.perf_counter()
 running = True
 while running:
-    clock.tick(FPS)
+    clock.tick(0 if turbo else FPS)
     # Frame number is useful for animations
     if frame > 3608:
         frame = 0
     else:
         frame += 1
 
+    current_time = time.perf_counter()
+    lag += current_time - previous_time
+    previous_time = current_time
+
     if game_state == GameState.MAIN_MENU:
+        lag = 0.0
         render_main_menu(frame)
+        py.display.flip()
     elif game_state == GameState.GAME:
-        render_game(frame)
-        run_timer()
+        if turbo:
+            ticks = TURBO_DRAW_EVERY
+            lag = 0.0
+        else:
+            # fixed timestep: as many ticks as real time has passed, frames are skipped when drawing is slow
+            ticks = int(lag / TICK_TIME)
+            if ticks > MAX_TICKS_PER_FRAME:
+                ticks = MAX_TICKS_PER_FRAME
+                lag = 0.0
+            else:
+                lag -= ticks * TICK_TIME
+        for tick in range(ticks):
+            if game_state != GameState.GAME:
+                break
+            game_tick()
+
+        # only changed parts of the screen are repainted and pushed to the display
+        if redraw_screen:
+            screen.fill(BACKGROUND_COLOR)
+            field.invalidate()
+            panel_dirty = True
+        dirty_rects = render_game()
+        if redraw_screen:
+            py.display.flip()
+            redraw_screen = False
+        elif len(dirty_rects) > 0:
+            py.display.update(dirty_rects)
+    else:
+        py.display.flip()
+
+    if PROFILE_STARTUP and not startup_reported:
+        startup_phase("first frame")
+        print_startup_profile()
+        startup_reported = True
 
     for event in py.event.get():
         if event.type == py.QUIT:
             running = False
-    py.display.flip()
-
-py.mixer.music.stop()
+        elif event.type == py.KEYDOWN and event.key == py.K_t:
+            turbo = not turbo
+            lag = 0.0
+        elif event.type in (py.MOUSEMOTION, py.MOUSEBUTTONDOWN, py.MOUSEBUTTONUP):
+            panel_dirty = True  # menu button may change its look
+
+music_thread.join()
+if py.mixer.get_init():
+    py.mixer.music.stop()
 py.quit()
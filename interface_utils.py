@@ -1,4 +1,5 @@
 import pygame as py
+import numpy as np
 
 
 # Transforms hex-color into a tuple
@@ -21,21 +22,38 @@ class Button:
             'hover': color("F8961E"),
             'pressed': color("F3722C"),
         }
-        self.surface = self.font.render(self.text, True, self.fillColors['normal'])
-        self.rect = self.surface.get_rect(center=(self.screen.get_width() * self.x, self.screen.get_height() * self.y))
         self.pressed = False
         self.hovered = False
         self.onclick_func = onclick_func
+        # labels are rendered once per font, process only swaps between them
+        self.surfaces = {}
+        self.color_mode = 'normal'
+        self.screen_size = None
+        self.render_surfaces()
+
+    def render_surfaces(self) -> None:
+        self.surfaces = {mode: self.font.render(self.text, True, fill_color)
+                         for mode, fill_color in self.fillColors.items()}
+        self.surface = self.surfaces[self.color_mode]
+        self.update_rect(True)
+
+    # rect only moves when the screen is resized or the label is re-rendered
+    def update_rect(self, force: bool = False) -> None:
+        screen_size = self.screen.get_size()
+        if force or screen_size != self.screen_size:
+            self.screen_size = screen_size
+            self.rect = self.surface.get_rect(center=(screen_size[0] * self.x, screen_size[1] * self.y))
 
     def process(self) -> None:
+        self.update_rect()
         mouse_pos = py.mouse.get_pos()
-        self.set_text_color("normal")
+        color_mode = "normal"
         if self.rect.collidepoint(mouse_pos):
             if not py.mouse.get_pressed(num_buttons=3)[0]:
                 self.hovered = True
-            self.set_text_color("hover")
+            color_mode = "hover"
             if py.mouse.get_pressed(num_buttons=3)[0] and self.hovered:
-                self.set_text_color("pressed")
+                color_mode = "pressed"
                 if not self.pressed:
                     self.onclick_func()
                     self.pressed = True
@@ -43,53 +61,80 @@ class Button:
                 self.pressed = False
         else:
             self.hovered = False
+        self.set_text_color(color_mode)
         self.screen.blit(self.surface, self.rect)
 
     def set_text_color(self, color_mode: str) -> None:
-        self.surface = self.font.render(self.text, True, self.fillColors[color_mode])
-        self.rect = self.surface.get_rect(center=(self.screen.get_width() * self.x, self.screen.get_height() * self.y))
+        self.color_mode = color_mode
+        self.surface = self.surfaces[color_mode]
 
     def set_font(self, new_font: py.font.Font) -> None:
         self.font = new_font
+        self.render_surfaces()
+
 
+# Colors of graph series, repeated when there are more series
+GRAPH_COLORS = [color("F8793A"), color("8BB964"), color("F9C74F"), color("43AA8B"), color("F94144"), color("90BE6D")]
+GRAPH_MARGIN = 2  # room for the 3px axis lines around the graph
 
+
+# Line chart over the last `capacity` samples, kept in ring buffers and rendered only when data is added
 class Graph:
-    def __init__(self, size, x, y, width, height):
+    def __init__(self, size, x, y, width, height, capacity=60, max_value=None, colors=None):
         self.size = int(size)
-        self.data = []
-        for i in range(size):
-            self.data.append([])
+        self.capacity = int(capacity)
+        self.data = np.zeros((self.size, self.capacity))
+        self.start = 0  # index of the oldest sample
+        self.count = 0
         self.x = int(x)
         self.y = int(y)
         self.width = int(width)
         self.height = int(height)
-        self.capacity = 60
         self.step = self.width / self.capacity
-        self.scale = self.height / self.capacity
-        self.colors = [color("F8793A"), color("8BB964")]
+        self.scale = self.height / (self.capacity if max_value is None else max_value)
+        self.colors = GRAPH_COLORS if colors is None else colors
+        self.surface = None
 
     def add_data(self, *args: float):
         if len(args) != self.size:
             print("Wrong number of arguments")
         else:
+            if self.count < self.capacity:
+                self.data[:, (self.start + self.count) % self.capacity] = args
+                self.count += 1
+            else:
+                self.data[:, self.start] = args
+                self.start = (self.start + 1) % self.capacity
+            self.surface = None
+
+    # samples from the oldest to the newest, shape (size, count)
+    def get_data(self) -> np.ndarray:
+        return self.data[:, (self.start + np.arange(self.count)) % self.capacity]
+
+    def render(self) -> py.Surface:
+        surface = py.Surface((self.width + 2 * GRAPH_MARGIN, self.height + 2 * GRAPH_MARGIN), py.SRCALPHA)
+        left = top = GRAPH_MARGIN
+
+        if self.count >= 2:
+            # no more than two points per pixel column, the newest sample is always drawn
+            stride = max(1, self.count // max(1, 2 * self.width))
+            indices = np.arange(0, self.count, stride)
+            if indices[-1] != self.count - 1:
+                indices = np.append(indices, self.count - 1)
+            xs = left + (indices * self.step).astype(int) + 1
+            xs[0] = left
+            data = self.get_data()[:, indices]
+            ys = top + self.height - ((data + 1) * self.scale).astype(int)
             for i in range(self.size):
-                self.data[i].append(args[i])
-            while len(self.data[0]) > self.capacity:
-                for data in self.data:
-                    data.pop(0)
+                points = np.column_stack((xs, ys[i])).tolist()
+                py.draw.lines(surface, self.colors[i % len(self.colors)], False, points, 3)
+
+        py.draw.line(surface, (255, 255, 255), (left, top), (left, top + self.height), 3)
+        py.draw.line(surface, (255, 255, 255), (left, top + self.height),
+                     (left + self.width, top + self.height), 3)
+        return surface
 
     def draw(self, screen: py.Surface) -> None:
-        if len(self.data[0]) >= 2:
-            for i in range(self.size):
-                first_pos = (self.x, self.y + self.height - int((self.data[i][0] + 1) * self.scale))
-                second_pos = (
-                self.x + int(self.step) + 1, self.y + self.height - int((self.data[i][1] + 1) * self.scale))
-                for j in range(len(self.data[i]) - 2):
-                    py.draw.line(screen, self.colors[i], first_pos, second_pos, 3)
-                    first_pos = second_pos
-                    second_pos = (self.x + int((j + 2) * self.step) + 1,
-                                  self.y + self.height - int((self.data[i][j + 2] + 1) * self.scale))
-                py.draw.line(screen, self.colors[i], first_pos, second_pos, 3)
-        py.draw.line(screen, (255, 255, 255), (self.x, self.y), (self.x, self.y + self.height), 3)
-        py.draw.line(screen, (255, 255, 255), (self.x, self.y + self.height),
-                     (self.x + self.width, self.y + self.height), 3)
+        if self.surface is None:
+            self.surface = self.render()
+        screen.blit(self.surface, (self.x - GRAPH_MARGIN, self.y - GRAPH_MARGIN))
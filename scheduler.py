@@ -0,0 +1,107 @@
+from heapq import heappush, heappop
+from simulation import Field
+
+# Discrete-event runner for headless matches.
+# A tick where no snake moves or revives and no food spawns only counts timers down, so instead of running
+# every tick the scheduler keeps a priority queue of the ticks where something happens and jumps straight
+# to them. Controllers are asked for a direction on those ticks only, plus on the tick right after the amount
+# of food changed, so AIs that switch speed depending on food (tymko_algo) get to react as they would in the
+# frame-by-frame loop of game_window. Ticks are resolved with Field.resolve_tick like there, so matches follow
+# the same rules, random streams differ from that loop.
+
+SNACK_SPAWN = 200
+APPLE_SPAWN = 800
+MATCH_TICKS = 2 * 60 * 60  # TIMER of game_window, in ticks
+
+# kinds of events, also their order inside one tick
+APPLE_EVENT = 0
+SNACK_EVENT = 1
+SNAKE_EVENT = 2
+REACT_EVENT = 3
+
+
+class EventScheduler:
+    # players are (snake, controller), controller(field, snake) returns a direction
+    def __init__(self, field: Field, players: list[tuple], match_ticks: int = MATCH_TICKS,
+                 snack_spawn: int = SNACK_SPAWN, apple_spawn: int = APPLE_SPAWN) -> None:
+        self.field = field
+        self.players = players
+        self.MATCH_TICKS = match_ticks
+        self.SNACK_SPAWN = snack_spawn
+        self.APPLE_SPAWN = apple_spawn
+
+        self.tick = 0  # next tick to run
+        self.processed_ticks = 0
+        self.queue = []  # (tick, kind, player index, version)
+        self.versions = [0] * len(players)  # snake entries with an older version are stale
+
+        heappush(self.queue, (self.APPLE_SPAWN, APPLE_EVENT, 0, 0))
+        heappush(self.queue, (self.SNACK_SPAWN, SNACK_EVENT, 0, 0))
+        for index in range(len(players)):
+            self.schedule_snake(index)
+
+    def schedule_snake(self, index: int) -> None:
+        snake = self.players[index][0]
+        self.versions[index] += 1
+        if self.field.has_snake(snake):
+            heappush(self.queue, (self.tick + snake.idle_ticks(), SNAKE_EVENT, index, self.versions[index]))
+
+    # tick of the next event that is still valid, None if there is none
+    def next_event_tick(self) -> int or None:
+        while len(self.queue) > 0:
+            tick, kind, index, version = self.queue[0]
+            if kind == SNAKE_EVENT and version != self.versions[index]:
+                heappop(self.queue)
+                continue
+            return tick
+        return None
+
+    def run(self) -> None:
+        while True:
+            tick = self.next_event_tick()
+            if tick is None or tick >= self.MATCH_TICKS:
+                break
+            self.skip_to(tick)
+            self.run_tick()
+        self.skip_to(self.MATCH_TICKS)
+
+    # counts all timers down to the given tick without running the ticks in between
+    def skip_to(self, tick: int) -> None:
+        ticks = tick - self.tick
+        if ticks <= 0:
+            return
+        for snake, controller in self.players:
+            if self.field.has_snake(snake):
+                snake.skip_ticks(ticks)
+        self.tick = tick
+
+    # runs self.tick the same way the frame loop runs every tick
+    def run_tick(self) -> None:
+        spawn_apple = spawn_snack = False
+        while len(self.queue) > 0 and self.queue[0][0] == self.tick:
+            tick, kind, index, version = heappop(self.queue)
+            if kind == APPLE_EVENT:
+                spawn_apple = True
+                heappush(self.queue, (self.tick + self.APPLE_SPAWN, APPLE_EVENT, 0, 0))
+            elif kind == SNACK_EVENT:
+                spawn_snack = True
+                heappush(self.queue, (self.tick + self.SNACK_SPAWN, SNACK_EVENT, 0, 0))
+
+        if spawn_apple:
+            self.field.random_spawn_apple()
+        if spawn_snack:
+            self.field.random_spawn_snack()
+        food = len(self.field.food)
+
+        directions = {}
+        for snake, controller in self.players:
+            if self.field.has_snake(snake):
+                directions[snake] = controller(self.field, snake)
+        self.field.resolve_tick(directions)
+
+        self.tick += 1
+        self.processed_ticks += 1
+        for index in range(len(self.players)):
+            self.schedule_snake(index)
+        if len(self.field.food) != food:
+            heappush(self.queue, (self.tick, REACT_EVENT, 0, 0))
@@ -0,0 +1,692 @@
+from enum import Enum
+from collections import deque
+from random import randint, random
+from bisect import bisect_left, insort
+import numpy as np
+
+# Pure game logic: no pygame, no audio, no display.
+# Rendering and sound are layered on top of it in ClassClaster.
+
+
+# immutable, so the same instance can be shared by the interned tables of Field and used as a dict/set key
+class Position:
+    __slots__ = ('x', 'y')
+
+    def __init__(self, x=0, y=0):
+        object.__setattr__(self, 'x', x)
+        object.__setattr__(self, 'y', y)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Position is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("Position is immutable")
+
+    def __reduce__(self):
+        return Position, (self.x, self.y)
+
+    def __add__(self, other):
+        if isinstance(other, Position):
+            return Position(self.x + other.x, self.y + other.y)
+        return NotImplemented
+
+    def __sub__(self, other):
+        if isinstance(other, Position):
+            return Position(self.x - other.x, self.y - other.y)
+        return NotImplemented
+
+    def __mul__(self, value):
+        if isinstance(value, int):
+            return Position(self.x * value, self.y * value)
+        return NotImplemented
+
+    def __rmul__(self, value):
+        return self.__mul__(value)
+
+    def __neg__(self):
+        return Position(-self.x, -self.y)
+
+    def __eq__(self, other):
+        if isinstance(other, Position):
+            return self.x == other.x and self.y == other.y
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __hash__(self):
+        return hash((self.x, self.y))
+
+    def __repr__(self):
+        return "(" + str(self.x) + ", " + str(self.y) + ")"
+
+    def copy(self):
+        return self  # nothing to copy, positions never change
+
+
+# values normally represent game cycles (FPS of the game)
+class LiveState(Enum):
+    ONE_TIME = 0
+    REVIVABLE = 300
+
+
+class SpeedState(Enum):
+    NORMAL = 30
+    ACCELERATION = 10
+
+
+class State(Enum):
+    EMPTY = 0
+    SNACK = 1
+    APPLE = 3
+    TAIL = 10
+    HEAD_LEFT = Position(-1, 0)
+    HEAD_UP = Position(0, -1)
+    HEAD_RIGHT = Position(1, 0)
+    HEAD_DOWN = Position(0, 1)
+
+
+# compact cell codes stored in Field.cells
+CODE_STATES = (State.EMPTY, State.SNACK, State.APPLE, State.TAIL,
+               State.HEAD_LEFT, State.HEAD_UP, State.HEAD_RIGHT, State.HEAD_DOWN)
+STATE_CODES = {state: code for code, state in enumerate(CODE_STATES)}
+EMPTY_CODE = STATE_CODES[State.EMPTY]
+SNACK_CODE = STATE_CODES[State.SNACK]
+APPLE_CODE = STATE_CODES[State.APPLE]
+
+NO_OWNER = 0
+NOT_FREE = -1
+UNREACHABLE = -1
+
+
+class EventType(Enum):
+    FOOD_EATEN = 0  # snake ate the food (state) at position
+    SNAKE_DIED = 1  # snake ran out of coyote time with its head at position
+    SNAKE_REVIVED = 2  # snake came back at position
+    WEIGHT_LOST = 3  # snake dropped its tail at position, the food spawned there comes as FOOD_SPAWNED
+    FOOD_SPAWNED = 4  # food (state) appeared at position
+
+
+# something that happened on the field; snake and state are None where they don't apply
+class Event:
+    __slots__ = ('type', 'snake', 'position', 'state')
+
+    def __init__(self, type: EventType, snake, position: Position, state: State = None):
+        self.type = type
+        self.snake = snake
+        self.position = position
+        self.state = state
+
+    def __repr__(self):
+        return f"Event({self.type.name}, {self.snake and self.snake.name}, {self.position}, {self.state})"
+
+
+# counts events of every snake, e.g. food eaten and deaths for match statistics
+class SnakeStats:
+    def __init__(self) -> None:
+        self.counts = {}  # (event type, snake name) -> number of events
+
+    def __call__(self, events: list[Event]) -> None:
+        for event in events:
+            if event.snake is not None:
+                key = (event.type, event.snake.name)
+                self.counts[key] = self.counts.get(key, 0) + 1
+
+    def count(self, type: EventType, snake) -> int:
+        return self.counts.get((type, snake.name), 0)
+
+
+def rand_event(odd: float) -> bool:
+    return random() <= odd
+
+
+def manhattan_cost(dx: int, dy: int) -> int:
+    return abs(dx) + abs(dy)
+
+
+# squared euclidean distance, keeps the same ordering without sqrt
+def euclidean_cost(dx: int, dy: int) -> int:
+    return dx * dx + dy * dy
+
+
+# food squares bucketed by row, with O(1) add and remove
+class FoodIndex:
+    def __init__(self) -> None:
+        self.positions = []  # swap-remove array of food positions
+        self.slots = {}  # position -> index in positions
+        self.rows = {}  # y -> {x: position}
+        self.row_keys = []  # sorted y of non-empty rows
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def __iter__(self):
+        return iter(self.positions)
+
+    def __contains__(self, position: Position) -> bool:
+        return position in self.slots
+
+    def add(self, position: Position) -> None:
+        if position in self.slots:
+            return
+        self.slots[position] = len(self.positions)
+        self.positions.append(position)
+
+        row = self.rows.get(position.y)
+        if row is None:
+            row = self.rows[position.y] = {}
+            insort(self.row_keys, position.y)
+        row[position.x] = position
+
+    def remove(self, position: Position) -> None:
+        slot = self.slots.pop(position)
+        last = self.positions.pop()
+        if slot != len(self.positions):
+            self.positions[slot] = last
+            self.slots[last] = slot
+
+        row = self.rows[position.y]
+        del row[position.x]
+        if len(row) == 0:
+            del self.rows[position.y]
+            del self.row_keys[bisect_left(self.row_keys, position.y)]
+
+    def nearest_manhattan(self, position: Position) -> Position or None:
+        return self.nearest(position, manhattan_cost)
+
+    def nearest_euclidean(self, position: Position) -> Position or None:
+        return self.nearest(position, euclidean_cost)
+
+    # rows are visited outwards from position.y until the row distance alone is worse than the best found,
+    # ties are broken in row-major order (lower y, then lower x), the stored position is returned
+    def nearest(self, position: Position, cost) -> Position or None:
+        if len(self.positions) == 0:
+            return None
+
+        best = None
+        below = bisect_left(self.row_keys, position.y)  # first row at or below position
+        above = below - 1
+        while below < len(self.row_keys) or above >= 0:
+            if above < 0 or (below < len(self.row_keys)
+                             and self.row_keys[below] - position.y < position.y - self.row_keys[above]):
+                y = self.row_keys[below]
+                below += 1
+            else:
+                y = self.row_keys[above]
+                above -= 1
+
+            dy = y - position.y
+            if best is not None and cost(0, dy) > best[0]:
+                break
+            for x, food in self.rows[y].items():
+                candidate = (cost(x - position.x, dy), y, x, food)  # (y, x) is unique, food is never compared
+                if best is None or candidate < best:
+                    best = candidate
+
+        return best[3]
+
+
+# board settings shared by the simulation, the AIs and the renderers
+class Rules:
+    def __init__(self, width: int = 25, height: int = 25) -> None:
+        self.width = int(width)
+        self.height = int(height)
+        self.area = self.width * self.height
+
+    def center(self) -> Position:
+        return Position(self.width // 2, self.height // 2)
+
+    # where the two snakes of game_window start, (10, 6) and (20, 15) on the classic 25x25 board
+    def start_positions(self) -> tuple[Position, Position]:
+        return (Position(self.width * 2 // 5, self.height // 4),
+                Position(self.width * 4 // 5, self.height * 3 // 5))
+
+
+class Field:
+    # class used by spawn_snake, adapters replace it with their own Snake subclass
+    snake_class = None
+
+    def __init__(self, rules: Rules) -> None:
+        self.snakes = []
+        self.food = FoodIndex()
+        self.dead_snakes = []  # removed from the board at the end of the tick
+        # events of the current tick, handed to every subscriber in one batch when the tick ends;
+        # without subscribers nothing is collected
+        self.events = []
+        self.subscribers = []
+        self.rules = rules
+        self.width = rules.width
+        self.height = rules.height
+        # grid is indexed [y, x]: cell state codes and owner ids of snakes (NO_OWNER if none)
+        self.cells = np.full((self.height, self.width), EMPTY_CODE, dtype=np.int8)
+        self.owners = np.full((self.height, self.width), NO_OWNER, dtype=np.int16)
+        self.snake_owners = {}
+        self.next_owner_id = NO_OWNER + 1
+        # ids of snakes removed for good are given to new snakes, so the owners grid never runs out of them
+        self.free_owner_ids = []
+        self.next_snake_name = 0
+        # flat indices (y * width + x) of empty squares in a swap-remove array,
+        # free_slots maps every flat index to its place there or NOT_FREE
+        self.free_cells = list(range(rules.area))
+        self.free_slots = list(range(rules.area))
+        # interned position of every square by flat index, and per direction the neighbour of every square
+        # (None outside the field), so moving around the board never allocates
+        self.cell_positions = [Position(x, y) for y in range(self.height) for x in range(self.width)]
+        # built by shifting whole rows, so that large boards are set up quickly
+        left, right = [], []
+        for y in range(self.height):
+            row = self.cell_positions[y * self.width:(y + 1) * self.width]
+            left += [None] + row[:-1]
+            right += row[1:] + [None]
+        self.neighbours = {State.HEAD_UP: [None] * self.width + self.cell_positions[:-self.width],
+                           State.HEAD_DOWN: self.cell_positions[self.width:] + [None] * self.width,
+                           State.HEAD_LEFT: left, State.HEAD_RIGHT: right}
+        self.tick = 0  # ticks run by resolve_tick
+        # bumped on every change of a square, caches built from the board compare against it
+        self.version = 0
+        self.food_distance_cache = None
+        self.food_distance_version = -1
+
+    # returns spawned snake
+    def spawn_snake(self, head_position: Position, facing: State, length: int, live: LiveState, coyote_death_time: int,
+                    drop_start_sprint: bool, sprint_lose_weight: int, odd_when_dying: float):
+        self.snakes.append(self.snake_class(head_position, facing, length, live, coyote_death_time,
+                                            drop_start_sprint, sprint_lose_weight, odd_when_dying, self))
+        return self.snakes[-1]
+
+    # interned position of a square, None if it is outside the field
+    def position(self, x: int, y: int) -> Position or None:
+        if x < 0 or x >= self.width or y < 0 or y >= self.height:
+            return None
+        return self.cell_positions[y * self.width + x]
+
+    # square next to position in the given direction, None if it is outside the field
+    def neighbour(self, position: Position, direction: State) -> Position or None:
+        return self.neighbours[direction][position.y * self.width + position.x]
+
+    # returns owner id under which snake is stored in the grid
+    def register_snake(self, snake) -> int:
+        if len(self.free_owner_ids) > 0:
+            owner_id = self.free_owner_ids.pop()
+        else:
+            if self.next_owner_id > np.iinfo(self.owners.dtype).max:
+                raise ValueError("Field can't hold more than " + str(np.iinfo(self.owners.dtype).max - NO_OWNER)
+                                 + " snakes at once")
+            owner_id = self.next_owner_id
+            self.next_owner_id += 1
+        self.snake_owners[owner_id] = snake
+        return owner_id
+
+    def unregister_snake(self, snake) -> None:
+        del self.snake_owners[snake.owner_id]
+        self.free_owner_ids.append(snake.owner_id)
+
+    # True while snake is on the field, its owner id may belong to another snake after it is removed for good
+    def has_snake(self, snake) -> bool:
+        return self.snake_owners.get(snake.owner_id) is snake
+
+    # names are never reused, unlike owner ids
+    def new_snake_name(self) -> int:
+        name = self.next_snake_name
+        self.next_snake_name += 1
+        return name
+
+    def spawn_snack(self, position: Position) -> bool:
+        if self.cells[position.y, position.x] == EMPTY_CODE:
+            self.add_food(position, State.SNACK)
+            return True
+        return False
+
+    def spawn_apple(self, position: Position) -> bool:
+        if self.cells[position.y, position.x] == EMPTY_CODE:
+            self.add_food(position, State.APPLE)
+            return True
+        return False
+
+    def add_food(self, position: Position, state: State) -> None:
+        self.set_square_state(position, state)
+        self.food.add(position)
+        self.emit(EventType.FOOD_SPAWNED, None, position, state)
+
+    def remove_food(self, position: Position) -> None:
+        self.food.remove(position)
+
+    def rand_position(self) -> Position:
+        return self.position(randint(0, self.width - 1), randint(0, self.height - 1))  # inclusive
+
+    def rand_free_position(self) -> Position or None:
+        if len(self.free_cells) == 0:
+            return None
+
+        return self.cell_positions[self.free_cells[randint(0, len(self.free_cells) - 1)]]
+
+    def random_spawn_snack(self) -> None:
+        position = self.rand_free_position()
+        if position is not None:
+            self.spawn_snack(position)
+
+    def random_spawn_apple(self) -> None:
+        position = self.rand_free_position()
+        if position is not None:
+            self.spawn_apple(position)
+
+    def set_square_state(self, position: Position, state: State, snake=None) -> None:
+        code = STATE_CODES[state]
+        index = position.y * self.width + position.x
+        if code == EMPTY_CODE:
+            if self.free_slots[index] == NOT_FREE:
+                self.free_slots[index] = len(self.free_cells)
+                self.free_cells.append(index)
+        elif self.free_slots[index] != NOT_FREE:
+            # swap-remove: last free cell takes the place of the occupied one
+            slot = self.free_slots[index]
+            last = self.free_cells.pop()
+            if last != index:
+                self.free_cells[slot] = last
+                self.free_slots[last] = slot
+            self.free_slots[index] = NOT_FREE
+
+        self.cells[position.y, position.x] = code
+        self.owners[position.y, position.x] = NO_OWNER if snake is None else snake.owner_id
+        self.version += 1
+
+    def get_square_state(self, position: Position) -> State:
+        return CODE_STATES[self.cells[position.y, position.x]]
+
+    def get_square_snake(self, position: Position):
+        owner_id = self.owners[position.y, position.x]
+        if owner_id == NO_OWNER:
+            return None
+        return self.snake_owners[owner_id]
+
+    # boolean [y, x] mask of squares with food on them
+    def food_mask(self) -> np.ndarray:
+        return (self.cells == SNACK_CODE) | (self.cells == APPLE_CODE)
+
+    # [y, x] number of steps from every square to the closest food, going only through empty and food squares,
+    # UNREACHABLE if no food can be reached. Computed once for every state of the board and shared by all snakes.
+    def food_distances(self) -> np.ndarray:
+        if self.food_distance_version == self.version:
+            return self.food_distance_cache
+
+        food = self.food_mask().ravel()
+        passable = food | (self.cells.ravel() == EMPTY_CODE)
+        distances = np.full(self.rules.area, UNREACHABLE, dtype=np.int32)
+        frontier = np.flatnonzero(food)
+        distances[frontier] = 0
+        step = 0
+        # multi-source BFS, the whole frontier is expanded at once on flat indices
+        while len(frontier) > 0:
+            step += 1
+            x = frontier % self.width
+            candidates = np.concatenate((frontier[frontier >= self.width] - self.width,
+                                         frontier[frontier < self.rules.area - self.width] + self.width,
+                                         frontier[x > 0] - 1,
+                                         frontier[x < self.width - 1] + 1))
+            candidates = candidates[passable[candidates] & (distances[candidates] == UNREACHABLE)]
+            frontier = np.unique(candidates)
+            distances[frontier] = step
+
+        self.food_distance_cache = distances.reshape(self.height, self.width)
+        self.food_distance_version = self.version
+        return self.food_distance_cache
+
+    def set_snakes_speed_state(self, index: int, state: SpeedState) -> None:
+        self.snakes[index].set_speed_state(state)
+
+    def move_snake(self, snake, direction: State) -> None:
+        self.snakes[snake].move(direction)
+
+    # runs one tick for all snakes at once, directions maps snake -> direction (a missing snake keeps going).
+    # Unlike calling move snake by snake, the outcome doesn't depend on the order: a head can't go to a square
+    # that is taken at the start of the tick (head-on and head-to-body crashes), and snakes that go for the
+    # same square all crash. Dead snakes are removed at the end, like remove_snakes after move.
+    def resolve_tick(self, directions: dict) -> None:
+        # timers and revives first, so every move is checked against the same board
+        movers = [snake for snake in self.snakes if snake.start_move(directions.get(snake, snake.direction))]
+
+        # spatial hash: target square -> snakes going there
+        targets = {}
+        crashed = []
+        for snake in movers:
+            target = self.neighbour(snake.snake[0], snake.direction)
+            if snake.is_blocked(target):
+                crashed.append(snake)
+            elif target in targets:
+                targets[target].append(snake)
+            else:
+                targets[target] = [snake]
+
+        moves = []
+        for target, snakes in targets.items():
+            if len(snakes) == 1:
+                moves.append((snakes[0], target))
+            else:
+                crashed.extend(snakes)
+
+        # the outcome is known, now the board is changed
+        for snake in crashed:
+            snake.dying_check(snake.direction)
+        for snake, target in moves:
+            snake.move_head(target)
+        self.remove_snakes()
+        self.tick += 1
+
+    # ends the tick of move calls: dead snakes are removed and the events go to the subscribers
+    def remove_snakes(self) -> None:
+        while len(self.dead_snakes) > 0:
+            snake = self.dead_snakes.pop(0)
+            if snake.LIVE_STATE == LiveState.ONE_TIME:
+                snake.complete_remove()
+            else:
+                snake.remove()
+        self.publish_events()
+
+    # subscriber(events) is called once per tick with all events of the tick, if there were any
+    def subscribe(self, subscriber) -> None:
+        self.subscribers.append(subscriber)
+
+    def unsubscribe(self, subscriber) -> None:
+        self.subscribers.remove(subscriber)
+
+    def emit(self, type: EventType, snake, position: Position, state: State = None) -> None:
+        if len(self.subscribers) > 0:
+            self.events.append(Event(type, snake, position, state))
+
+    def publish_events(self) -> None:
+        if len(self.events) == 0:
+            return
+        events = self.events
+        self.events = []
+        for subscriber in self.subscribers:
+            subscriber(events)
+
+
+class Snake:
+    def __init__(self, head_position: Position, facing: State, length: int, live: LiveState,
+                 coyote_death_time: int, drop_start_sprint: bool, sprint_lose_weight: int, odd_when_dying: float,
+                 field: Field):
+        self.snake = deque()
+        self.field = field
+        self.direction = facing
+        self.owner_id = self.field.register_snake(self)
+        self.name = self.field.new_snake_name()  # unique even when snakes are removed for good
+
+        self.food = 0
+
+        self.move_timer = 0
+        self.speed_state = SpeedState.NORMAL
+
+        self.DROP_START_SPRINT = drop_start_sprint
+        self.sprint_lose_weight_timer = 0
+        self.SPRINT_LOSE_WEIGHT = sprint_lose_weight
+        self.ODD_WHEN_DYING = odd_when_dying
+
+        self.START_TAIL_LENGTH = length - 1
+        self.near_death_counter = 0  # represents if sneak had died previous move
+        self.COYOTE_DEATH_TIME = coyote_death_time
+        self.revive_timer = 0
+        self.LIVE_STATE = live
+
+        x, y = head_position.x, head_position.y
+        for i in range(self.START_TAIL_LENGTH + 1):
+            position = self.field.position(x, y)
+            if position is None:
+                raise ValueError("Snake " + str(self.name) + " does not fit into the field")
+            self.snake.append(position)
+            self.field.set_square_state(position, facing if i == 0 else State.TAIL, self)
+            x -= facing.value.x
+            y -= facing.value.y
+
+    # number of coming move calls that would only count down a timer
+    def idle_ticks(self) -> int:
+        if self.revive_timer == 1:
+            return 0
+        if self.revive_timer != 0:
+            return self.revive_timer - 1
+        return self.move_timer
+
+    # same as that many move calls, as long as all of them are idle
+    def skip_ticks(self, ticks: int) -> None:
+        if self.revive_timer != 0:
+            self.revive_timer -= ticks
+        else:
+            self.move_timer -= ticks
+
+    def set_speed_state(self, state: SpeedState) -> None:
+        self.speed_state = state
+        self.move_timer = 0
+        if state == SpeedState.ACCELERATION:
+            self.sprint_lose_weight_timer = 0
+            if self.DROP_START_SPRINT:
+                self.lose_weight()
+
+    def lose_weight(self) -> None:
+        if len(self.snake) > 1:
+            poop_pos = self.snake.pop()
+            self.field.emit(EventType.WEIGHT_LOST, self, poop_pos)
+            self.field.add_food(poop_pos, State.SNACK)
+
+    def revive(self) -> None:
+        # direction is same as before death
+        self.food = self.START_TAIL_LENGTH
+
+        self.move_timer = 0
+        self.sprint_lose_weight_timer = 0
+
+        random_pos = self.field.rand_free_position()
+        if random_pos is None:
+            return
+
+        self.revive_timer = 0
+        self.snake.append(random_pos)
+        self.field.set_square_state(random_pos, self.direction, self)
+        self.field.emit(EventType.SNAKE_REVIVED, self, random_pos)
+
+    def remove(self) -> None:
+        while not len(self.snake) == 0:
+            position = self.snake.popleft()
+            if rand_event(self.ODD_WHEN_DYING):
+                self.field.set_square_state(position, State.EMPTY)
+            else:
+                self.field.add_food(position, State.SNACK)  # leave some mats
+
+    def complete_remove(self) -> None:
+        self.remove()
+        self.field.snakes.remove(self)
+        self.field.unregister_snake(self)
+
+    def dying_check(self, new_direction: State) -> None:
+        if self.near_death_counter != self.COYOTE_DEATH_TIME:
+            self.near_death_counter += 1
+            self.field.set_square_state(self.snake[0], new_direction, self)
+        else:
+            self.field.emit(EventType.SNAKE_DIED, self, self.snake[0])
+            self.field.dead_snakes.append(self)
+            if self.LIVE_STATE != LiveState.ONE_TIME:
+                self.revive_timer = self.LIVE_STATE.value
+                self.near_death_counter = 0
+
+    def move(self, direction: State) -> None:
+        if not self.start_move(direction):
+            return
+
+        new_head_position = self.field.neighbour(self.snake[0], self.direction)
+        if self.is_blocked(new_head_position):
+            self.dying_check(self.direction)
+            return
+        self.move_head(new_head_position)
+
+    # counts timers down and turns the snake, returns True if the snake moves on this tick
+    def start_move(self, direction: State) -> bool:
+        # if needs to be revived
+        if self.revive_timer == 1:
+            self.revive()
+            return False
+        # check if need to wait to revive
+        elif self.revive_timer != 0:
+            self.revive_timer -= 1
+            return False
+        # else - alive
+
+        # check if need to wait for a move
+        if self.move_timer != 0:
+            self.move_timer -= 1
+            return False
+        # else - turn to move
+
+        # restarting timer for movement
+        self.move_timer = self.speed_state.value
+
+        # check if moving outside of tail
+        if len(self.snake) > 1:
+            if self.field.neighbour(self.snake[0], direction) is not self.snake[1]:
+                self.direction = direction
+        else:
+            self.direction = direction
+        # else don't change
+        return True
+
+    # True if the head can't go to new_head_position (None when outside of the field)
+    def is_blocked(self, new_head_position: Position or None) -> bool:
+        # check if going out of field
+        if new_head_position is None:
+            return True
+
+        # means if snake crashes into its end-tail, but also it will grow next move
+        if new_head_position == self.snake[-1] and self.food != 0:
+            return True
+
+        new_head_square_state = self.field.get_square_state(new_head_position)
+        return (new_head_square_state != State.EMPTY and new_head_square_state != State.APPLE
+                and new_head_square_state != State.SNACK)
+
+    # moves the head to a square that is not blocked, eating food on it
+    def move_head(self, new_head_position: Position) -> None:
+        new_head_square_state = self.field.get_square_state(new_head_position)
+
+        if new_head_square_state == State.APPLE or new_head_square_state == State.SNACK:
+            self.field.remove_food(new_head_position)
+            self.food += new_head_square_state.value
+            self.field.emit(EventType.FOOD_EATEN, self, new_head_position, new_head_square_state)
+
+        # if all checks done - than we can move our snake
+        self.near_death_counter = 0
+
+        if self.speed_state == SpeedState.ACCELERATION:
+            if self.sprint_lose_weight_timer == self.SPRINT_LOSE_WEIGHT:
+                self.lose_weight()
+                self.sprint_lose_weight_timer = 0
+            else:
+                self.sprint_lose_weight_timer += 1
+
+        self.field.set_square_state(self.snake[0], State.TAIL, self)  # making old head a tail
+        if self.food != 0:
+            self.food -= 1
+        else:
+            self.field.set_square_state(self.snake.pop(), State.EMPTY)  # delete tail
+        self.snake.appendleft(new_head_position)  # adding a new head
+        self.field.set_square_state(self.snake[0], self.direction, self)  # drawing new! head
+
+Field.snake_class = Snake
@@ -0,0 +1,165 @@
+import argparse
+import json
+import math
+import os
+import random
+from multiprocessing import Pool
+
+from simulation import Field, Rules, State, LiveState, EventType, SnakeStats
+from scheduler import EventScheduler
+import tymko_algo
+import CrazySnakeAI.brain as CAi
+
+# Headless matches between the AIs with the rules of game_window.game_tick:
+#   python tournament.py --matches 1000 --output results.jsonl
+# Every finished match is appended to the output file, running the same command again
+# skips the seeds that are already there.
+
+# results of other versions (older rules or bugs) are not mixed into reports
+RESULTS_VERSION = 1
+
+PLAYERS = {
+    'tymko': tymko_algo.get_direction,
+    'tymko-bfs': tymko_algo.get_direction_bfs,
+    'crazy': CAi.act,
+}
+
+Z_95 = 1.96
+
+
+# seats are swapped on odd seeds, so both players start from both positions equally often
+def seat_players(players: tuple[str, str], seed: int) -> tuple[str, str]:
+    return players if seed % 2 == 0 else (players[1], players[0])
+
+
+def run_match(players: tuple[str, str], seed: int, board: tuple[int, int] = (25, 25)) -> dict:
+    random.seed(seed)
+    seats = seat_players(players, seed)
+    rules = Rules(*board)
+    field = Field(rules)
+    stats = SnakeStats()
+    field.subscribe(stats)
+    snakes = [field.spawn_snake(position, State.HEAD_RIGHT, 6, LiveState.REVIVABLE, 3, True, 30, 0.5)
+              for position in rules.start_positions()]
+    for name, snake in zip(seats, snakes):
+        if name == 'crazy':
+            CAi.start_game(snake)
+
+    EventScheduler(field, [(snake, PLAYERS[name]) for name, snake in zip(seats, snakes)]).run()
+
+    result = {'version': RESULTS_VERSION, 'seed': seed, 'players': list(players), 'board': list(board)}
+    for key, values in (('length', [len(snake.snake) for snake in snakes]),
+                        ('deaths', [stats.count(EventType.SNAKE_DIED, snake) for snake in snakes]),
+                        ('eaten', [stats.count(EventType.FOOD_EATEN, snake) for snake in snakes])):
+        # reported in order of players, not seats
+        result[key] = values if seats == players else values[::-1]
+    return result
+
+
+def run_match_args(args: tuple) -> dict:
+    return run_match(*args)
+
+
+def read_results(file_name: str, players: tuple[str, str], board: tuple[int, int]) -> list[dict]:
+    results = []
+    if not os.path.exists(file_name):
+        return results
+    with open(file_name, 'r') as file:
+        for line in file:
+            line = line.strip()
+            if len(line) == 0:
+                continue
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # last line of an interrupted run
+            # results written before boards were configurable are all 25x25
+            if (result.get('version') == RESULTS_VERSION and tuple(result['players']) == players
+                    and tuple(result.get('board', (25, 25))) == board):
+                results.append(result)
+    return results
+
+
+# expected score -> Elo difference
+def elo_difference(score: float) -> float:
+    if score <= 0:
+        return -math.inf
+    if score >= 1:
+        return math.inf
+    return -400 * math.log10(1 / score - 1)
+
+
+def report(results: list[dict], players: tuple[str, str]) -> str:
+    n = len(results)
+    if n == 0:
+        return "No matches played"
+
+    scores = []
+    wins = draws = 0
+    for result in results:
+        if result['length'][0] > result['length'][1]:
+            wins += 1
+            scores.append(1.0)
+        elif result['length'][0] == result['length'][1]:
+            draws += 1
+            scores.append(0.5)
+        else:
+            scores.append(0.0)
+    losses = n - wins - draws
+
+    score = sum(scores) / n
+    deviation = math.sqrt(sum((s - score) ** 2 for s in scores) / (n - 1)) if n > 1 else 0.0
+    margin = Z_95 * deviation / math.sqrt(n)
+    low, high = max(score - margin, 0.0), min(score + margin, 1.0)
+
+    # Wilson interval for the plain win rate
+    win_rate = wins / n
+    centre = (win_rate + Z_95 ** 2 / (2 * n)) / (1 + Z_95 ** 2 / n)
+    spread = Z_95 * math.sqrt(win_rate * (1 - win_rate) / n + Z_95 ** 2 / (4 * n * n)) / (1 + Z_95 ** 2 / n)
+
+    lines = [f"{players[0]} vs {players[1]}: {n} matches",
+             f"{players[0]} wins {wins}, draws {draws}, losses {losses}",
+             f"{players[0]} win rate {win_rate:.3f} (95% CI {centre - spread:.3f} - {centre + spread:.3f})",
+             f"{players[0]} score {score:.3f} (95% CI {low:.3f} - {high:.3f})",
+             f"Elo difference {elo_difference(score):+.0f} "
+             f"(95% CI {elo_difference(low):+.0f} - {elo_difference(high):+.0f})"]
+    for index, name in enumerate(players):
+        lines.append(f"{name}: mean length {sum(r['length'][index] for r in results) / n:.2f}, "
+                     f"deaths {sum(r['deaths'][index] for r in results) / n:.2f}, "
+                     f"food eaten {sum(r['eaten'][index] for r in results) / n:.2f}")
+    return '\n'.join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Headless tournament between snake AIs")
+    parser.add_argument('--players', nargs=2, default=['tymko', 'crazy'], choices=sorted(PLAYERS))
+    parser.add_argument('--matches', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0, help="seed of the first match")
+    parser.add_argument('--board', nargs=2, type=int, default=[25, 25], metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--output', default='tournament.jsonl', help="results file, used to resume runs")
+    args = parser.parse_args()
+
+    players = tuple(args.players)
+    board = tuple(args.board)
+    results = read_results(args.output, players, board)
+    done = {result['seed'] for result in results}
+    todo = [(players, seed, board) for seed in range(args.seed, args.seed + args.matches) if seed not in done]
+    print(f"{len(done)} matches already played, {len(todo)} to go")
+
+    try:
+        with open(args.output, 'a') as file, Pool(args.workers) as pool:
+            for result in pool.imap_unordered(run_match_args, todo):
+                file.write(json.dumps(result) + '\n')
+                file.flush()
+                results.append(result)
+                print(f"\rMatches completed: {len(results)}", end='')
+    except KeyboardInterrupt:
+        print("\rInterrupted, run again to resume")
+    print('\r', end='')
+
+    print(report([r for r in results if args.seed <= r['seed'] < args.seed + args.matches], players))
+
+
+if __name__ == '__main__':
+    main()
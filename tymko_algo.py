@@ -1,12 +1,24 @@
 import math
+import weakref
+import numpy as np
 
-from ClassClaster import *
+from simulation import *
 import random
 
 directions = [State.HEAD_UP, State.HEAD_RIGHT, State.HEAD_DOWN, State.HEAD_LEFT]
 
 
 def get_direction(field: Field, snake: Snake) -> State:
+    return choose_direction(field, snake, get_closest_food)
+
+
+# same as get_direction, but follows the shortest path to food around walls and bodies
+def get_direction_bfs(field: Field, snake: Snake) -> State:
+    return choose_direction(field, snake, get_shortest_path_food)
+
+
+# closest_food(field, available_directions, snake) picks one of several safe directions
+def choose_direction(field: Field, snake: Snake, closest_food) -> State:
     if len(snake.snake) == 0:
         return snake.direction
 
@@ -23,7 +35,7 @@ def get_direction(field: Field, snake: Snake) -> State:
     if len(available_directions) > 1:
         available_directions = filter_directions(available_directions, field, snake)
     if len(available_directions) > 1:
-        return get_closest_food(field, available_directions, snake)
+        return closest_food(field, available_directions, snake)
     if len(available_directions) == 1:
         return available_directions[0]
     return snake.direction
@@ -32,8 +44,8 @@ def get_direction(field: Field, snake: Snake) -> State:
 def get_available_directions(field: Field, square_pos: Position) -> [State, ...]:
     available_directions = []
     for direction in directions:
-        position = square_pos + direction.value
-        if position.x < 0 or position.x > field.field_size - 1 or position.y < 0 or position.y > field.field_size - 1:
+        position = field.neighbour(square_pos, direction)
+        if position is None:
             continue
 
         current_square_state = field.get_square_state(position)
@@ -44,36 +56,273 @@ def get_available_directions(field: Field, square_pos: Position) -> [State, ...]
     return available_directions
 
 
+# moves that don't lead into a pocket the snake can't get out of; if every move does, the ones that keep
+# the snake alive for the longest
 def filter_directions(available_directions: [State, ...], field: Field, snake: Snake) -> [State, ...]:
-    result = []
-    for available_direction in available_directions:
-        states = []
+    regions = get_regions(field)
+    needed = len(snake.snake) + snake.food  # squares the snake has to fit into to follow its own tail
+    safe = []
+    best = []
+    best_ticks = None
+    for direction in available_directions:
+        position = field.neighbour(snake.snake[0], direction)
+        size = regions.size(position)
+        if size >= needed:
+            safe.append(direction)
+            continue
+
+        # pocket: safe only if a body square at its border frees up before the snake runs out of room
+        ticks = size * move_ticks(snake)
+        if escape_ticks(field, regions, position) <= ticks:
+            safe.append(direction)
+        elif best_ticks is None or ticks > best_ticks:
+            best = [direction]
+            best_ticks = ticks
+        elif ticks == best_ticks:
+            best.append(direction)
+
+    return safe if len(safe) > 0 else best
+
+
+# ticks between two moves of a snake
+def move_ticks(snake: Snake) -> int:
+    return snake.speed_state.value + 1
+
+
+# ticks until the first body square next to the region of position becomes free, None if none of them will
+def escape_ticks(field: Field, regions, position: Position) -> float:
+    escape = math.inf
+    bodies = {}  # snake -> {position: index from head}
+    for square in regions.cells(position):
         for direction in directions:
-            states.append(field.get_square_state(available_direction.value + direction.value))
-        if states.__contains__(State.EMPTY) or states.__contains__(State.SNACK) or states.__contains__(State.APPLE):
-            result.append(available_direction)
-    return result
+            neighbour = field.neighbour(square, direction)
+            if neighbour is None:
+                continue
+            owner = field.get_square_snake(neighbour)
+            if owner is None or owner.revive_timer != 0:
+                continue
+            if owner not in bodies:
+                bodies[owner] = {body: index for index, body in enumerate(owner.snake)}
+            # tail squares go first, growing snakes keep their tail for a while
+            moves = len(owner.snake) - bodies[owner][neighbour] + owner.food
+            escape = min(escape, moves * move_ticks(owner))
+    return escape
 
 
+# connected regions of squares a head can go to (empty or food). Labels are updated from the squares that
+# changed since the last query: a freed square joins its neighbours' regions, a taken square splits its
+# region only if its neighbours can't reach each other, which is found by searching from all of them at once
+# and stopping as soon as they meet - so the cost depends on the changed squares, not on the board.
+NO_REGION = 0
 
-def get_closest_food(field: Field, available_directions: [State, ...], snake: Snake) -> State:
-    foods = []
-    for food in field.food:
-        foods.append(Position((food.rect[0] - field.x) // field.square_size,
-                              (food.rect[1] - field.y) // field.square_size))
 
-    if len(foods) == 0:
+class Regions:
+    def __init__(self, field: Field) -> None:
+        self.field = field
+        self.width = field.width
+        self.area = field.rules.area
+        self.labels = [NO_REGION] * self.area  # flat index -> region label
+        self.sizes = {}  # label -> number of squares
+        self.next_label = NO_REGION + 1
+        self.passable = np.zeros(self.area, dtype=bool)
+        self.version = -1
+
+    def update(self) -> None:
+        if self.version == self.field.version:
+            return
+        passable = self.field.food_mask().ravel() | (self.field.cells.ravel() == EMPTY_CODE)
+        if self.version == -1:
+            self.build(passable)
+            self.version = self.field.version
+            return
+        self.version = self.field.version
+        for index in np.flatnonzero(passable != self.passable).tolist():
+            if passable[index]:
+                self.add(index)
+            else:
+                self.remove(index)
+        self.passable = passable
+
+    # labels the whole board from scratch
+    def build(self, passable: np.ndarray) -> None:
+        for index in np.flatnonzero(passable).tolist():
+            if self.labels[index] != NO_REGION:
+                continue
+            label = self.next_label
+            self.next_label += 1
+            self.labels[index] = label
+            found = [index]
+            for cell in found:
+                for neighbour in self.neighbours(cell):
+                    if passable[neighbour] and self.labels[neighbour] == NO_REGION:
+                        self.labels[neighbour] = label
+                        found.append(neighbour)
+            self.sizes[label] = len(found)
+        self.passable = passable
+
+    # number of squares in the region of position, 0 if the square is taken
+    def size(self, position: Position) -> int:
+        self.update()
+        label = self.labels[position.y * self.width + position.x]
+        return self.sizes.get(label, 0)
+
+    # positions of all squares in the region of position
+    def cells(self, position: Position) -> [Position, ...]:
+        self.update()
+        index = position.y * self.width + position.x
+        if self.labels[index] == NO_REGION:
+            return []
+        return [self.field.cell_positions[cell] for cell in self.flood(index, self.labels[index])]
+
+    def neighbours(self, index: int) -> [int, ...]:
+        result = []
+        if index >= self.width:
+            result.append(index - self.width)
+        if index < self.area - self.width:
+            result.append(index + self.width)
+        x = index % self.width
+        if x > 0:
+            result.append(index - 1)
+        if x < self.width - 1:
+            result.append(index + 1)
+        return result
+
+    # all squares with the given label that are connected to index
+    def flood(self, index: int, label: int) -> [int, ...]:
+        found = [index]
+        seen = {index}
+        for cell in found:
+            for neighbour in self.neighbours(cell):
+                if neighbour not in seen and self.labels[neighbour] == label:
+                    seen.add(neighbour)
+                    found.append(neighbour)
+        return found
+
+    def relabel(self, cells: [int, ...], label: int) -> None:
+        for cell in cells:
+            self.labels[cell] = label
+
+    def add(self, index: int) -> None:
+        touching = {self.labels[neighbour] for neighbour in self.neighbours(index)} - {NO_REGION}
+        if len(touching) == 0:
+            label = self.next_label
+            self.next_label += 1
+            self.sizes[label] = 0
+        else:
+            # smaller regions are merged into the largest one
+            label = max(touching, key=self.sizes.get)
+            for other in touching - {label}:
+                start = next(n for n in self.neighbours(index) if self.labels[n] == other)
+                cells = self.flood(start, other)
+                self.relabel(cells, label)
+                self.sizes[label] += len(cells)
+                del self.sizes[other]
+        self.labels[index] = label
+        self.sizes[label] += 1
+
+    def remove(self, index: int) -> None:
+        label = self.labels[index]
+        self.labels[index] = NO_REGION
+        self.sizes[label] -= 1
+        if self.sizes[label] == 0:
+            del self.sizes[label]
+            return
+
+        starts = [neighbour for neighbour in self.neighbours(index) if self.labels[neighbour] == label]
+        if len(starts) <= 1:
+            return
+
+        # one breadth-first search per neighbour, a step of each in turn; searches that meet are joined
+        groups = list(range(len(starts)))
+
+        def find(search: int) -> int:
+            while groups[search] != search:
+                search = groups[search]
+            return search
+
+        queues = [[start] for start in starts]
+        heads = [0] * len(starts)
+        owner = {start: search for search, start in enumerate(starts)}
+        while True:
+            for search in range(len(starts)):
+                if heads[search] == len(queues[search]):
+                    continue
+                cell = queues[search][heads[search]]
+                heads[search] += 1
+                for neighbour in self.neighbours(cell):
+                    if self.labels[neighbour] != label:
+                        continue
+                    if neighbour not in owner:
+                        owner[neighbour] = search
+                        queues[search].append(neighbour)
+                    else:
+                        groups[find(owner[neighbour])] = find(search)
+
+            roots = {find(search) for search in range(len(starts))}
+            if len(roots) == 1:
+                return  # still one region
+            running = {find(search) for search in range(len(starts)) if heads[search] < len(queues[search])}
+            if len(running) <= 1:
+                break
+
+        # every finished group is a separate region, a group still running keeps the old label
+        keep = running.pop() if len(running) > 0 else roots.pop()
+        for root in roots - {keep}:
+            cells = [cell for search in range(len(starts)) if find(search) == root for cell in queues[search]]
+            new_label = self.next_label
+            self.next_label += 1
+            self.relabel(cells, new_label)
+            self.sizes[new_label] = len(cells)
+            self.sizes[label] -= len(cells)
+
+
+# regions are kept per field between calls
+_regions = weakref.WeakKeyDictionary()
+
+
+def get_regions(field: Field) -> Regions:
+    regions = _regions.get(field)
+    if regions is None:
+        regions = _regions[field] = Regions(field)
+    return regions
+
+
+def get_closest_food(field: Field, available_directions: [State, ...], snake: Snake) -> State:
+    if len(field.food) == 0:
         return random.choice(available_directions)
 
     head_pos = snake.snake[0]
     closest_direction = available_directions[0]
-    distance_to_food = distance(foods[0], closest_direction.value + head_pos)
+    distance_to_food = None
     for direction in available_directions:
-        for food in foods:
-            current_distance = distance(food, direction.value + head_pos)
-            if current_distance < distance_to_food:
-                closest_direction = direction
-                distance_to_food = current_distance
+        position = field.neighbour(head_pos, direction)
+        current_distance = distance(field.food.nearest_euclidean(position), position)
+        if distance_to_food is None or current_distance < distance_to_food:
+            closest_direction = direction
+            distance_to_food = current_distance
+    return closest_direction
+
+
+def get_shortest_path_food(field: Field, available_directions: [State, ...], snake: Snake) -> State:
+    if len(field.food) == 0:
+        return random.choice(available_directions)
+
+    distances = field.food_distances()
+    head_pos = snake.snake[0]
+    closest_direction = None
+    distance_to_food = None
+    for direction in available_directions:
+        position = field.neighbour(head_pos, direction)
+        current_distance = distances[position.y, position.x]
+        if current_distance == UNREACHABLE:
+            continue
+        if distance_to_food is None or current_distance < distance_to_food:
+            closest_direction = direction
+            distance_to_food = current_distance
+
+    # all food is walled off - at least head towards it
+    if closest_direction is None:
+        return get_closest_food(field, available_directions, snake)
     return closest_direction
 
 